@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Bootstrap confidence intervals for the protest classifier (sample_texts).
+
+metrics.py / threshold.py give point estimates on a few thousand human
+labels; this adds percentile CIs for accuracy, precision, recall, F1, F0.5
+and for the F-beta-optimal threshold itself.
+
+Resampling is vectorized: each chunk draws a (n_boot, n) index matrix and
+computes all metrics for all rows at once (the threshold optimum via one
+row-wise sort + cumsum). Chunks run in a process pool with independent seeds.
+
+--stratify resamples within each paper (keeps the outlet mix fixed);
+--by_paper additionally reports CIs per outlet.
+
+Example:
+  python bootstrap.py --threshold 0.65 --n_boot 10000 --stratify --by_paper
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pymongo import MongoClient
+
+from threshold import MONGO_URI, DB_NAME, COLLECTION, load_labels
+
+METRICS = ("accuracy", "precision", "recall", "f1", "fbeta", "best_threshold", "best_fbeta")
+CHUNK_SIZE = 500  # resamples per task; keeps the (chunk, n) matrices small
+
+
+# ----------------------------
+# Vectorized resampling
+# ----------------------------
+def resample_indices(rng: np.random.Generator, n_boot: int, strata: List[np.ndarray]) -> np.ndarray:
+    """
+    (n_boot, n) index matrix. Each stratum (array of row indices) is resampled
+    with replacement within itself, so stratum sizes are identical in every row.
+    """
+    n = sum(len(g) for g in strata)
+    idx = np.empty((n_boot, n), dtype=np.int64)
+    col = 0
+    for g in strata:
+        m = len(g)
+        idx[:, col:col + m] = g[rng.integers(0, m, size=(n_boot, m))]
+        col += m
+    return idx
+
+def _div(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b != 0)
+
+def _fbeta(precision: np.ndarray, recall: np.ndarray, beta: float) -> np.ndarray:
+    b2 = beta * beta
+    return _div((1 + b2) * precision * recall, b2 * precision + recall)
+
+def metric_samples(y: np.ndarray, scores: np.ndarray, idx: np.ndarray, threshold: float, beta: float) -> Dict[str, np.ndarray]:
+    """All metrics for every row of the index matrix (one value per resample)."""
+    yb = y[idx].astype(bool)
+    sb = scores[idx]
+    pb = sb >= threshold
+
+    tp = np.count_nonzero(yb & pb, axis=1)
+    fp = np.count_nonzero(~yb & pb, axis=1)
+    fn = np.count_nonzero(yb & ~pb, axis=1)
+    n = idx.shape[1]
+    precision = _div(tp, tp + fp)
+    recall = _div(tp, tp + fn)
+
+    # Threshold optimum per row: sort each row by score (desc), cumsum labels,
+    # and only consider cut points at the end of a run of equal scores.
+    order = np.argsort(-sb, axis=1, kind="stable")
+    s_sorted = np.take_along_axis(sb, order, axis=1)
+    y_sorted = np.take_along_axis(yb, order, axis=1)
+    tp_cum = np.cumsum(y_sorted, axis=1)
+    fp_cum = np.arange(1, n + 1) - tp_cum
+    n_pos = tp_cum[:, -1:]
+    f_curve = _fbeta(_div(tp_cum, tp_cum + fp_cum), _div(tp_cum, n_pos), beta)
+    f_curve[:, :-1][s_sorted[:, 1:] == s_sorted[:, :-1]] = -1.0
+    best = np.argmax(f_curve, axis=1)
+    rows = np.arange(idx.shape[0])
+
+    return {
+        "accuracy": (tp + (n - tp - fp - fn)) / n,
+        "precision": precision,
+        "recall": recall,
+        "f1": _fbeta(precision, recall, 1.0),
+        "fbeta": _fbeta(precision, recall, beta),
+        "best_threshold": s_sorted[rows, best],
+        "best_fbeta": f_curve[rows, best],
+    }
+
+def _bootstrap_chunk(task) -> Dict[str, np.ndarray]:
+    y, scores, strata, threshold, beta, n_boot, seed = task
+    rng = np.random.default_rng(seed)
+    return metric_samples(y, scores, resample_indices(rng, n_boot, strata), threshold, beta)
+
+def bootstrap(
+    y_true,
+    scores,
+    *,
+    threshold: float,
+    beta: float = 0.5,
+    n_boot: int = 10000,
+    groups: Optional[np.ndarray] = None,
+    workers: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, np.ndarray]:
+    """
+    n_boot resampled values per metric. groups (same length as y) makes the
+    resampling stratified by group. workers=1 runs in-process.
+    """
+    y = np.asarray(y_true, dtype=np.int64)
+    s = np.asarray(scores, dtype=np.float64)
+    if groups is None:
+        strata = [np.arange(len(y))]
+    else:
+        groups = np.asarray(groups)
+        strata = [np.flatnonzero(groups == g) for g in np.unique(groups)]
+
+    sizes = [min(CHUNK_SIZE, n_boot - i) for i in range(0, n_boot, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(y, s, strata, threshold, beta, size, ss) for size, ss in zip(sizes, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        parts = [_bootstrap_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            parts = list(pool.map(_bootstrap_chunk, tasks))
+    return {k: np.concatenate([p[k] for p in parts]) for k in METRICS}
+
+def point_estimates(y_true, scores, *, threshold: float, beta: float = 0.5) -> Dict[str, float]:
+    """Same metrics on the original sample (identity index row)."""
+    y = np.asarray(y_true, dtype=np.int64)
+    idx = np.arange(len(y))[None, :]
+    return {k: float(v[0]) for k, v in metric_samples(y, np.asarray(scores, dtype=np.float64), idx, threshold, beta).items()}
+
+def confidence_intervals(samples: Dict[str, np.ndarray], alpha: float = 0.05) -> Dict[str, Tuple[float, float]]:
+    """Percentile intervals (alpha/2, 1 - alpha/2) per metric."""
+    q = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+    return {k: tuple(float(x) for x in np.percentile(v, q)) for k, v in samples.items()}
+
+
+# ----------------------------
+# Main
+# ----------------------------
+def _print_table(title: str, point: Dict[str, float], ci: Dict[str, Tuple[float, float]], beta: float, alpha: float) -> None:
+    print(f"\n=== {title} ===")
+    print(f"  {'metric':<16} {'point':>7}   {100 * (1 - alpha):.0f}% CI")
+    for k in METRICS:
+        name = {"fbeta": f"F{beta:g}", "best_fbeta": f"best F{beta:g}"}.get(k, k)
+        lo, hi = ci[k]
+        print(f"  {name:<16} {point[k]:>7.3f}   [{lo:.3f}, {hi:.3f}]")
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--collection", default=COLLECTION)
+    p.add_argument("--threshold", type=float, default=0.65, help="Decision threshold for the fixed-threshold metrics.")
+    p.add_argument("--beta", type=float, default=0.5)
+    p.add_argument("--n_boot", type=int, default=10000)
+    p.add_argument("--alpha", type=float, default=0.05)
+    p.add_argument("--workers", type=int, default=0, help="Processes (0 = all CPUs, 1 = in-process).")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--stratify", action="store_true", help="Resample within each paper.")
+    p.add_argument("--by_paper", action="store_true", help="Also report CIs per paper.")
+    p.add_argument("--min_paper_docs", type=int, default=30, help="Skip papers with fewer labelled docs in --by_paper.")
+    args = p.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    y, s, papers = load_labels(client[DB_NAME][args.collection], with_paper=True)
+    print(f"Loaded {len(y)} labelled docs ({int(y.sum())} protest) from {len(np.unique(papers))} papers.")
+    if not len(y):
+        return
+
+    t0 = time.perf_counter()
+    samples = bootstrap(
+        y, s,
+        threshold=args.threshold,
+        beta=args.beta,
+        n_boot=args.n_boot,
+        groups=papers if args.stratify else None,
+        workers=args.workers or None,
+        seed=args.seed,
+    )
+    elapsed = time.perf_counter() - t0
+    _print_table(
+        f"All papers (t={args.threshold:.2f}, {args.n_boot} resamples{', stratified by paper' if args.stratify else ''})",
+        point_estimates(y, s, threshold=args.threshold, beta=args.beta),
+        confidence_intervals(samples, args.alpha),
+        args.beta,
+        args.alpha,
+    )
+    print(f"\n[bootstrap] {args.n_boot} resamples in {elapsed:.2f}s")
+
+    if args.by_paper:
+        for paper in np.unique(papers):
+            mask = papers == paper
+            if mask.sum() < args.min_paper_docs:
+                print(f"\n[bootstrap] skip {paper}: {int(mask.sum())} docs < {args.min_paper_docs}")
+                continue
+            ys, ss = y[mask], s[mask]
+            paper_samples = bootstrap(
+                ys, ss, threshold=args.threshold, beta=args.beta, n_boot=args.n_boot,
+                workers=args.workers or None, seed=args.seed,
+            )
+            _print_table(
+                f"{paper} (n={int(mask.sum())}, protest={int(ys.sum())})",
+                point_estimates(ys, ss, threshold=args.threshold, beta=args.beta),
+                confidence_intervals(paper_samples, args.alpha),
+                args.beta,
+                args.alpha,
+            )
+
+if __name__ == "__main__":
+    main()
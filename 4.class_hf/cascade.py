@@ -0,0 +1,162 @@
+"""cascade.py
+
+Cheap first stage for the two-stage protest classifier used by
+`run_hf.py --cascade`.
+
+Stage 1 is a TF-IDF + logistic regression model trained on the human labels
+in sample_texts. It scores every document; only documents whose score falls
+inside an uncertainty band [lo, hi) are sent to bart-large-mnli (stage 2).
+Documents below lo are NOT PROTEST, documents at/above hi are PROTEST.
+
+The band is tuned on out-of-fold stage-1 scores so that the documents stage 1
+decides on its own agree with human_label at least `target_agreement` of the
+time, while sending as few documents as possible to BART. A stratified
+HOLDOUT_SHARE of the labels is kept out of tuning and the band's agreement is
+reported on it (sample_texts is both the training set and the default target,
+so the tuning agreement alone is optimistic).
+
+Documents decided by stage 1 get hf_stage="cheap" and their stage-1 score in
+hf_cheap_score; hf_confidence and the other BART-only fields are removed
+(hf_confidence only ever holds the BART P(PROTEST)). Downstream:
+- run_hf.py never re-sends them to BART unless --force, with or without
+  --cascade; relabel_from_confidence / relabel_per_paper keep their label
+- the --threshold what-if plots keep their stored label
+- threshold.py / bootstrap.py report how many labelled docs they exclude
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, train_test_split
+from sklearn.pipeline import Pipeline
+
+CHEAP_MODEL_NAME = "tfidf-logreg (cascade stage 1)"
+HUMAN_LABEL_FIELD = "human_label"
+HOLDOUT_SHARE = 0.25  # labels kept out of band tuning to report held-out agreement
+
+
+def doc_text(title: str, text: str, max_chars: int = 4000) -> str:
+    """Text seen by the cheap model (same truncation as the BART input)."""
+    return f"{title}\n\n{text[:max_chars]}"
+
+
+def make_model() -> Pipeline:
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2), min_df=2, stop_words="english")),
+        ("clf", LogisticRegression(max_iter=1000, class_weight="balanced")),
+    ])
+
+
+def load_training_docs(col, max_chars: int = 4000) -> Tuple[List[str], np.ndarray]:
+    """Texts + binary human labels from the human-labelled collection."""
+    docs = list(col.find(
+        {HUMAN_LABEL_FIELD: {"$in": [0, 1]}, "text": {"$exists": True, "$ne": ""}},
+        {"_id": 0, "title": 1, "text": 1, HUMAN_LABEL_FIELD: 1},
+    ))
+    texts = [doc_text(d.get("title") or "", d.get("text") or "", max_chars) for d in docs]
+    y = np.array([int(d[HUMAN_LABEL_FIELD]) for d in docs], dtype=int)
+    return texts, y
+
+
+def tune_band(scores: np.ndarray, y_true: np.ndarray, target_agreement: float) -> Tuple[float, float, Dict[str, float]]:
+    """Pick the band [lo, hi) that sends the fewest docs to stage 2.
+
+    Candidate edges are the score percentiles. A band is feasible when the
+    docs outside it, labelled by stage 1 alone, agree with y_true at least
+    `target_agreement` of the time. Falls back to [0, 1] + (everything goes to
+    BART) when no band is feasible.
+    """
+    edges = np.unique(np.concatenate([[0.0], np.quantile(scores, np.linspace(0, 1, 101)), [1.0 + 1e-9]]))
+    best = (0.0, 1.0 + 1e-9)
+    best_in_band = 1.0
+    best_agreement = float("nan")
+
+    for i, lo in enumerate(edges):
+        for hi in edges[i:]:
+            outside = (scores < lo) | (scores >= hi)
+            if not outside.any():
+                continue
+            in_band = 1.0 - outside.mean()
+            if in_band >= best_in_band:
+                continue
+            pred = (scores >= hi).astype(int)
+            agreement = float((pred[outside] == y_true[outside]).mean())
+            if agreement >= target_agreement:
+                best, best_in_band, best_agreement = (float(lo), float(hi)), in_band, agreement
+
+    return best[0], best[1], {"share_to_bart": best_in_band, "stage1_agreement": best_agreement}
+
+
+def band_stats(scores: np.ndarray, y_true: np.ndarray, lo: float, hi: float) -> Dict[str, float]:
+    """Share sent to BART and stage-1 agreement of a fixed band on (scores, y_true)."""
+    outside = (scores < lo) | (scores >= hi)
+    pred = (scores >= hi).astype(int)
+    agreement = float((pred[outside] == y_true[outside]).mean()) if outside.any() else float("nan")
+    return {"share_to_bart": float(1.0 - outside.mean()), "stage1_agreement": agreement}
+
+
+@dataclass
+class Cascade:
+    model: Pipeline
+    lo: float
+    hi: float
+    max_chars: int = 4000
+    model_name: str = CHEAP_MODEL_NAME
+
+    def score(self, docs: List[Dict[str, Any]]) -> np.ndarray:
+        texts = [doc_text(d.get("title") or "", d.get("text") or "", self.max_chars) for d in docs]
+        return self.model.predict_proba(texts)[:, 1]
+
+    def decide(self, score: float) -> Optional[int]:
+        """1/0 when stage 1 is confident, None when the doc must go to BART."""
+        if score < self.lo:
+            return 0
+        if score >= self.hi:
+            return 1
+        return None
+
+    def reason(self, score: float, label_name: str) -> str:
+        return (
+            f"Cascade stage 1: score={score:.3f} outside band "
+            f"[{self.lo:.3f}, {self.hi:.3f}) -> {label_name}"
+        )
+
+
+def build_cascade(train_col, *, target_agreement: float = 0.95, max_chars: int = 4000, folds: int = 5) -> Cascade:
+    """Train stage 1 on human labels and tune the uncertainty band."""
+    texts, y = load_training_docs(train_col, max_chars)
+    if len(set(y.tolist())) < 2:
+        raise RuntimeError(f"Need both classes in {HUMAN_LABEL_FIELD} to train the cascade (got {len(y)} docs).")
+
+    if int(np.bincount(y).min()) < 4:
+        raise RuntimeError(f"Need at least 4 docs of each class in {HUMAN_LABEL_FIELD} to tune and hold out "
+                           f"(got {np.bincount(y).tolist()}).")
+
+    tune_idx, hold_idx = train_test_split(np.arange(len(y)), test_size=HOLDOUT_SHARE, stratify=y, random_state=0)
+    tune_texts, hold_texts = [texts[i] for i in tune_idx], [texts[i] for i in hold_idx]
+    y_tune, y_hold = y[tune_idx], y[hold_idx]
+
+    n_splits = min(folds, int(np.bincount(y_tune).min()))
+    cv = StratifiedKFold(n_splits=max(n_splits, 2), shuffle=True, random_state=0)
+    oof = cross_val_predict(make_model(), tune_texts, y_tune, cv=cv, method="predict_proba")[:, 1]
+    lo, hi, info = tune_band(oof, y_tune, target_agreement)
+
+    hold_scores = make_model().fit(tune_texts, y_tune).predict_proba(hold_texts)[:, 1]
+    held = band_stats(hold_scores, y_hold, lo, hi)
+    print(
+        f"[cascade] tuned on {len(y_tune)} human labels; band=[{lo:.3f}, {hi:.3f}) "
+        f"share_to_bart={info['share_to_bart']:.2%} stage1_agreement={info['stage1_agreement']:.3f} "
+        f"(target={target_agreement:.2f})"
+    )
+    print(
+        f"[cascade] held-out ({len(y_hold)} labels): share_to_bart={held['share_to_bart']:.2%} "
+        f"stage1_agreement={held['stage1_agreement']:.3f}"
+    )
+
+    model = make_model().fit(texts, y)
+    return Cascade(model=model, lo=lo, hi=hi, max_chars=max_chars)
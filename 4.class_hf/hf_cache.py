@@ -0,0 +1,65 @@
+"""hf_cache.py
+
+Persistent, content-addressed cache of raw NLI logits for hf_class.
+
+Key = sha256 of (model, hypothesis template, candidate labels, model input
+text). The input text is the already-truncated sequence, so changing
+max_chars only misses for documents whose input actually changed.
+
+Value = the raw logits (one row per hypothesis, one column per NLI class),
+stored as JSON. Storing logits instead of final probabilities keeps the
+entry valid for any way of turning them into P(PROTEST).
+
+Backed by a local SQLite file (stdlib only); safe to share between threads
+and processes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+_SQLITE_MAX_VARS = 500
+
+
+def make_key(model: str, template: str, labels: Sequence[str], sequence: str) -> str:
+    payload = json.dumps([model, template, list(labels), sequence], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class InferenceCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS nli_cache (key TEXT PRIMARY KEY, logits TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[List[float]]]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, List[List[float]]] = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_MAX_VARS):
+                chunk = keys[i:i + _SQLITE_MAX_VARS]
+                marks = ",".join("?" * len(chunk))
+                for key, logits in self._conn.execute(
+                    f"SELECT key, logits FROM nli_cache WHERE key IN ({marks})", chunk
+                ):
+                    found[key] = json.loads(logits)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, List[List[float]]]]) -> None:
+        rows = [(key, json.dumps(logits)) for key, logits in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO nli_cache (key, logits) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM nli_cache").fetchone()[0]
@@ -6,12 +6,23 @@ Design goals:
 - Easy-to-read MongoDB fields.
 - Store ONE "final" label field (hf_label_name) + numeric score (hf_confidence).
 - Threshold is passed in at run time but NOT stored per document.
+- Importing is cheap: the model is loaded lazily on first use (or warmup()),
+  and torch / numpy / transformers are only imported by the functions that
+  need them, so e.g. `from hf_class import PROTEST_LABEL` stays light.
 """
 
 from __future__ import annotations
 
-from typing import Optional, Dict, Any
-from transformers import pipeline
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import torch
+
+    from hf_cache import InferenceCache
 
 # ----------------------------
 # Model + labels
@@ -22,51 +33,401 @@ HF_MODEL_NAME = "facebook/bart-large-mnli"
 PROTEST_LABEL = "a concrete real-world protest event"
 OTHER_LABEL = "something else (no specific protest event)"
 CANDIDATE_LABELS = [PROTEST_LABEL, OTHER_LABEL]
+HYPOTHESIS_TEMPLATE = "The main focus of this article is {}."
 
-_zsc = pipeline(
-    task="zero-shot-classification",
-    model=HF_MODEL_NAME,
-)
+# Documents per forward pass in classify_articles_with_hf (each document
+# expands to len(CANDIDATE_LABELS) premise/hypothesis pairs, 1 in binary mode).
+INFER_BATCH_SIZE = 8
 
+# When set, classify_article(s)_with_hf and classify_articles_windowed are
+# answered by a running hf_server.py and this process does not load the model.
+HF_SERVER_URL = os.getenv("HF_SERVER_URL")
+HF_SERVER_TIMEOUT = float(os.getenv("HF_SERVER_TIMEOUT", "600"))
 
-def classify_article_with_hf(
-    title: str,
-    text: str,
-    *,
-    protest_threshold: float = 0.65,
-    max_chars: int = 4000,
-    min_length: int = 200,
-) -> Optional[Dict[str, Any]]:
-    """Classify a document as PROTEST / NOT PROTEST.
+# ----------------------------
+# Lazy model singleton
+# ----------------------------
+# Importing this module is cheap (constants, helpers); the 1.6 GB model is
+# only built on the first call that needs it, or explicitly via warmup().
+_zsc = None
+_zsc_lock = threading.Lock()
+_tokenizer = None
+_label2id: Optional[Dict[str, int]] = None
 
-    Returns None when text is missing/too short.
 
-    Returns dict keys:
-      - confidence: float  (P(PROTEST))
-      - label: int         (1 for PROTEST, 0 for NOT PROTEST)
-      - label_name: str    ("PROTEST" | "NOT PROTEST")
-      - top_label: str     (argmax label from the ZSC output)
-      - top_score: float
-      - model: str
-      - reason: str        (human readable; includes threshold for transparency)
+def _get_zsc():
+    """The zero-shot pipeline (tokenizer + model), created once, thread-safe."""
+    global _zsc
+    if _zsc is None:
+        with _zsc_lock:
+            if _zsc is None:
+                from transformers import pipeline
+
+                t0 = time.perf_counter()
+                zsc = pipeline(task="zero-shot-classification", model=HF_MODEL_NAME)
+                zsc.model.eval()
+                param_mb = sum(p.numel() * p.element_size() for p in zsc.model.parameters()) / 2**20
+                print(
+                    f"[hf_class] loaded {HF_MODEL_NAME} in {time.perf_counter() - t0:.1f}s "
+                    f"(weights={param_mb:.0f} MB, process peak RSS={_peak_rss_mb():.0f} MB)"
+                )
+                _zsc = zsc
+    return _zsc
+
+
+def _get_tokenizer():
+    """Tokenizer only (no model weights), so the ONNX backends never load the torch model."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _zsc_lock:
+            if _tokenizer is None:
+                if _zsc is not None:
+                    _tokenizer = _zsc.tokenizer
+                else:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
+    return _tokenizer
+
+
+def _get_label2id() -> Dict[str, int]:
+    global _label2id
+    if _label2id is None:
+        from transformers import AutoConfig
+        _label2id = dict(AutoConfig.from_pretrained(HF_MODEL_NAME).label2id)
+    return _label2id
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def model_loaded() -> bool:
+    return _zsc is not None
+
+
+def warmup(n_batches: int = 2, batch_size: int = INFER_BATCH_SIZE) -> None:
+    """Load the model and run a few dummy batches so the first real batch is not slow.
+
+    Goes through the selected backend / NLI mode and bypasses the cache.
+    No-op when calls are forwarded to hf_server.py.
     """
-    if not text or len(text.strip()) < min_length:
-        return None
+    if HF_SERVER_URL:
+        return
+    t0 = time.perf_counter()
+    if HF_BACKEND == "torch":
+        _get_zsc()
+    dummy = ("Warmup", "Hundreds of people marched through the city centre on Saturday. " * 8)
+    for _ in range(n_batches):
+        classify_articles_with_hf([dummy] * batch_size, batch_size=batch_size, use_cache=False)
+    print(f"[hf_class] warmup: {n_batches} batch(es) of {batch_size} in {time.perf_counter() - t0:.1f}s")
+
+# ----------------------------
+# Inference backend
+# ----------------------------
+# "torch"     -> eager PyTorch (default)
+# "onnx"      -> model exported to ONNX, run with ONNX Runtime (fp32)
+# "onnx-int8" -> same export + dynamic int8 weight quantization
+# "distilled" -> small fine-tuned encoder trained by distill.py (not NLI:
+#                one forward pass per article, sigmoid = P(PROTEST))
+# "biencoder" -> MiniLM embedding similarity to the label descriptions,
+#                calibrated on human labels (see biencoder.py); results also
+#                carry the article embedding for reuse by topic modelling
+BACKENDS = ("torch", "onnx", "onnx-int8", "distilled", "biencoder")
+HF_BACKEND = os.getenv("HF_BACKEND", "torch")
+ONNX_DIR = os.getenv("HF_ONNX_DIR", "onnx_bart_mnli")
+DISTILLED_DIR = os.getenv("HF_DISTILLED_DIR", "distilled_protest")
+DISTILLED_MAX_LENGTH = 512
+
+_ort_sessions: Dict[str, Any] = {}
+_distilled: Optional[Tuple[Any, Any]] = None
+
+# ----------------------------
+# Inference cache
+# ----------------------------
+# Raw NLI logits keyed by (model+backend, template, labels, input); see hf_cache.py.
+# Set HF_CACHE_PATH="" to disable.
+HF_CACHE_PATH = os.getenv("HF_CACHE_PATH", "hf_cache.sqlite")
+
+_cache: Optional[InferenceCache] = None
+
+# ----------------------------
+# NLI mode
+# ----------------------------
+# "pair"   -> one premise/hypothesis pass per candidate label, softmax over the
+#             entailment logits (what the zero-shot pipeline does).
+# "binary" -> only the PROTEST hypothesis; P(PROTEST) from entailment vs
+#             contradiction, then mapped onto the "pair" hf_confidence scale
+#             with the calibration written by calibrate_binary.py. Half the
+#             forward passes of "pair".
+NLI_MODES = ("pair", "binary")
+HF_NLI_MODE = os.getenv("HF_NLI_MODE", "pair")
+BINARY_CALIBRATION_PATH = os.getenv("HF_BINARY_CALIBRATION", "binary_calibration.json")
+
+_binary_calibration: Optional[Dict[str, Any]] = None
+
+
+def set_nli_mode(name: str) -> None:
+    """Select "pair" (default) or "binary" scoring."""
+    global HF_NLI_MODE
+    if name not in NLI_MODES:
+        raise ValueError(f"Unknown NLI mode '{name}'. Choose one of: {', '.join(NLI_MODES)}")
+    HF_NLI_MODE = name
+
+
+def _hypothesis_labels() -> List[str]:
+    return [PROTEST_LABEL] if HF_NLI_MODE == "binary" else CANDIDATE_LABELS
+
+
+def _calibrate_binary(raw: float) -> float:
+    """Map a raw binary-mode score onto the pair-mode hf_confidence scale."""
+    global _binary_calibration
+    if _binary_calibration is None:
+        if not os.path.exists(BINARY_CALIBRATION_PATH):
+            raise FileNotFoundError(
+                f"Binary mode needs {BINARY_CALIBRATION_PATH}; run calibrate_binary.py first."
+            )
+        with open(BINARY_CALIBRATION_PATH, encoding="utf-8") as f:
+            _binary_calibration = json.load(f)
+    import numpy as np
 
+    # Monotone piecewise-linear map (isotonic fit), so tuned thresholds keep their meaning.
+    return float(np.interp(raw, _binary_calibration["raw"], _binary_calibration["calibrated"]))
+
+
+def _get_cache() -> Optional[InferenceCache]:
+    global _cache
+    if _cache is None and HF_CACHE_PATH:
+        from hf_cache import InferenceCache
+        _cache = InferenceCache(HF_CACHE_PATH)
+    return _cache
+
+
+def _cache_key(sequence: str) -> str:
+    from hf_cache import make_key
+    return make_key(f"{HF_MODEL_NAME}|{HF_BACKEND}", HYPOTHESIS_TEMPLATE, _hypothesis_labels(), sequence)
+
+
+def set_backend(name: str) -> None:
+    """Select the inference backend used by classify_article(s)_with_hf."""
+    global HF_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    HF_BACKEND = name
+
+
+def export_onnx(*, quantize: bool = False, onnx_dir: str = ONNX_DIR) -> str:
+    """Export the NLI model to ONNX (once) and return the model path.
+
+    With quantize=True a dynamically int8-quantized copy is written next to
+    the fp32 export (weights int8, activations quantized at run time).
+    """
+    os.makedirs(onnx_dir, exist_ok=True)
+    fp32_path = os.path.join(onnx_dir, "model.onnx")
+    int8_path = os.path.join(onnx_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+
+        class _LogitsOnly(torch.nn.Module):
+            """Wrap the HF model so torch.onnx.export sees a plain tensor output."""
+
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask):
+                return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+        print(f"[hf_class] exporting {HF_MODEL_NAME} to {fp32_path}")
+        zsc = _get_zsc()
+        dummy = zsc.tokenizer(
+            ["Title: x\n\nArticle:\nexample"],
+            [HYPOTHESIS_TEMPLATE.format(PROTEST_LABEL)],
+            return_tensors="pt",
+        )
+        torch.onnx.export(
+            _LogitsOnly(zsc.model),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=14,
+        )
+
+    if not quantize:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"[hf_class] quantizing {fp32_path} -> {int8_path} (dynamic int8)")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    return int8_path
+
+
+def _get_ort_session(backend: str):
+    if backend not in _ort_sessions:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                f"Backend '{backend}' needs onnxruntime: pip install onnxruntime"
+            ) from e
+
+        path = export_onnx(quantize=(backend == "onnx-int8"))
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        _ort_sessions[backend] = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+    return _ort_sessions[backend]
+
+
+def _record_batch(stats: Optional[Dict[str, Any]], attention_mask: torch.Tensor, seconds: float) -> None:
+    """Per-forward-pass telemetry: real vs padded tokens and latency."""
+    if stats is None:
+        return
+    stats["batches"] = stats.get("batches", 0) + 1
+    stats["real_tokens"] = stats.get("real_tokens", 0) + int(attention_mask.sum())
+    stats["padded_tokens"] = stats.get("padded_tokens", 0) + int(attention_mask.numel())
+    stats.setdefault("forward_ms", []).append(seconds * 1000.0)
+
+
+def _forward_logits(enc, stats: Optional[Dict[str, Any]] = None) -> torch.Tensor:
+    """NLI logits for a tokenized batch on the selected backend."""
+    import torch
+
+    t0 = time.perf_counter()
+    if HF_BACKEND == "torch":
+        model = _get_zsc().model
+        with torch.inference_mode():
+            logits = model(**enc.to(model.device)).logits
+    else:
+        session = _get_ort_session(HF_BACKEND)
+        (out,) = session.run(
+            ["logits"],
+            {
+                "input_ids": enc["input_ids"].numpy(),
+                "attention_mask": enc["attention_mask"].numpy(),
+            },
+        )
+        logits = torch.from_numpy(out)
+    _record_batch(stats, enc["attention_mask"], time.perf_counter() - t0)
+    return logits
+
+
+def _build_sequence(title: str, text: str, max_chars: int) -> str:
     truncated_text = text[:max_chars]
-    sequence = f"Title: {title}\n\nArticle:\n{truncated_text}"
+    return f"Title: {title}\n\nArticle:\n{truncated_text}"
+
+
+def _nli_class_id(prefix: str) -> int:
+    # Same lookup the zero-shot pipeline does internally for "entail".
+    for name, idx in _get_label2id().items():
+        if name.lower().startswith(prefix):
+            return int(idx)
+    return -1
+
+
+def _entailment_id() -> int:
+    return _nli_class_id("entail")
 
-    result = _zsc(
-        sequence,
-        candidate_labels=CANDIDATE_LABELS,
-        hypothesis_template="The main focus of this article is {}.",
-        multi_label=False,
+
+def _nli_logits(sequences: List[str], stats: Optional[Dict[str, Any]] = None) -> List[List[List[float]]]:
+    """Raw NLI logits, shape (len(sequences), n_hypotheses, n_classes).
+
+    All (sequence, hypothesis) pairs of the batch go through the model in a
+    single forward pass. n_hypotheses is 1 in binary mode.
+    """
+    hypotheses = [HYPOTHESIS_TEMPLATE.format(label) for label in _hypothesis_labels()]
+    premises = [seq for seq in sequences for _ in hypotheses]
+    enc = _get_tokenizer()(
+        premises,
+        hypotheses * len(sequences),
+        truncation="only_first",
+        padding=True,
+        return_tensors="pt",
     )
+    logits = _forward_logits(enc, stats)
+    return logits.reshape(len(sequences), len(hypotheses), -1).tolist()
+
+
+def _label_probs(logits: List[List[float]]) -> List[float]:
+    """P(label) for every CANDIDATE_LABELS entry from one document's logits.
+
+    pair:   softmax over the entailment logits, as the pipeline does with
+            multi_label=False.
+    binary: softmax over (entailment, contradiction) of the PROTEST
+            hypothesis, calibrated; P(OTHER) = 1 - P(PROTEST).
+    """
+    if HF_NLI_MODE == "binary":
+        confidence = _calibrate_binary(_binary_raw(logits))
+        return [confidence, 1.0 - confidence]
+
+    import torch
+
+    entail = torch.tensor(logits)[:, _entailment_id()]
+    return entail.softmax(dim=-1).tolist()
+
+
+def _binary_raw(logits: List[List[float]]) -> float:
+    """Uncalibrated P(PROTEST): entailment vs contradiction of the PROTEST hypothesis."""
+    import torch
+
+    row = torch.tensor(logits[0])
+    return row[[_entailment_id(), _nli_class_id("contra")]].softmax(dim=-1)[0].item()
+
+
+def binary_raw_scores(
+    articles: Sequence[Tuple[str, str]],
+    *,
+    max_chars: int = 4000,
+    min_length: int = 200,
+    batch_size: int = INFER_BATCH_SIZE,
+) -> List[Optional[float]]:
+    """Uncalibrated binary-mode P(PROTEST) per article (None if too short).
+
+    Used by calibrate_binary.py to fit the map onto the pair-mode scale.
+    """
+    previous = HF_NLI_MODE
+    set_nli_mode("binary")
+    try:
+        seqs = [
+            _build_sequence(title or "", text, max_chars) if text and len(text.strip()) >= min_length else None
+            for title, text in articles
+        ]
+        todo = [seq for seq in seqs if seq is not None]
+        raw = iter(_cached_logits(todo, batch_size=batch_size) if todo else [])
+        return [None if seq is None else _binary_raw(next(raw)) for seq in seqs]
+    finally:
+        set_nli_mode(previous)
+
+
+def _model_tag() -> str:
+    """hf_model value: model name plus any non-default backend / NLI mode."""
+    if HF_BACKEND == "distilled":
+        return f"distilled:{os.path.basename(os.path.normpath(DISTILLED_DIR))}"
+    if HF_BACKEND == "biencoder":
+        from biencoder import EMBEDDING_MODEL_NAME
+        return f"biencoder:{EMBEDDING_MODEL_NAME}"
+    extras = [x for x in (HF_BACKEND if HF_BACKEND != "torch" else None,
+                          HF_NLI_MODE if HF_NLI_MODE != "pair" else None) if x]
+    return f"{HF_MODEL_NAME} ({', '.join(extras)})" if extras else HF_MODEL_NAME
+
 
-    labels = result.get("labels", [])
-    scores = result.get("scores", [])
+def _result_from_output(labels: List[str], scores: List[float], protest_threshold: float) -> Dict[str, Any]:
+    """Turn (labels, scores) sorted by score into the dict stored in MongoDB."""
     if not labels or not scores or len(labels) != len(scores):
-        raise ValueError(f"Unexpected classifier output: {result}")
+        raise ValueError(f"Unexpected classifier output: labels={labels} scores={scores}")
 
     top_label = str(labels[0])
     top_score = float(scores[0])
@@ -86,7 +447,7 @@ def classify_article_with_hf(
     reason = (
         f"Top='{top_label}' ({top_score:.3f}); "
         f"P(PROTEST)={confidence:.3f}; "
-        f"threshold={protest_threshold:.2f} -> {label_name}"
+        f"threshold={protest_threshold:.4f} -> {label_name}"
     )
 
     return {
@@ -95,6 +456,429 @@ def classify_article_with_hf(
         "label_name": label_name,
         "top_label": top_label,
         "top_score": top_score,
-        "model": HF_MODEL_NAME,
+        "model": _model_tag(),
         "reason": reason,
     }
+
+
+def _cached_logits(
+    sequences: List[str],
+    *,
+    batch_size: int,
+    use_cache: bool = True,
+    stats: Optional[Dict[str, Any]] = None,
+) -> List[List[List[float]]]:
+    """NLI logits per sequence: cache hits first, misses in length-sorted batches."""
+    cache = _get_cache() if use_cache else None
+    keys = [_cache_key(seq) for seq in sequences]
+    logits_by_seq: List[Optional[List[List[float]]]] = [None] * len(sequences)
+    if cache is not None:
+        cached = cache.get_many(keys)
+        for j, key in enumerate(keys):
+            logits_by_seq[j] = cached.get(key)
+    misses = [j for j in range(len(sequences)) if logits_by_seq[j] is None]
+
+    t0 = time.perf_counter()
+
+    if misses:
+        # Token lengths only decide the bucket order; the model input itself is
+        # truncated to the model max length in _nli_logits.
+        miss_seqs = [sequences[j] for j in misses]
+        lengths = [len(ids) for ids in _get_tokenizer()(miss_seqs, add_special_tokens=False)["input_ids"]]
+        order = sorted(range(len(misses)), key=lambda m: lengths[m])
+
+        for start in range(0, len(order), batch_size):
+            bucket = [misses[m] for m in order[start:start + batch_size]]
+            batch_logits = _nli_logits([sequences[j] for j in bucket], stats)
+            for j, row in zip(bucket, batch_logits):
+                logits_by_seq[j] = row
+            if cache is not None:
+                cache.put_many((keys[j], row) for j, row in zip(bucket, batch_logits))
+
+    if stats is not None:
+        stats["docs"] = stats.get("docs", 0) + len(misses)
+        stats["seconds"] = stats.get("seconds", 0.0) + (time.perf_counter() - t0)
+        stats["cache_hits"] = stats.get("cache_hits", 0) + len(sequences) - len(misses)
+        stats["cache_misses"] = stats.get("cache_misses", 0) + len(misses)
+
+    return logits_by_seq
+
+
+def _get_distilled() -> Tuple[Any, Any]:
+    global _distilled
+    if _distilled is None:
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if not os.path.isdir(DISTILLED_DIR):
+            raise FileNotFoundError(f"Backend 'distilled' needs {DISTILLED_DIR}/; train it with distill.py first.")
+        tokenizer = AutoTokenizer.from_pretrained(DISTILLED_DIR)
+        model = AutoModelForSequenceClassification.from_pretrained(DISTILLED_DIR).eval()
+        _distilled = (tokenizer, model)
+    return _distilled
+
+
+def distilled_scores(
+    sequences: List[str],
+    *,
+    batch_size: int = 32,
+    stats: Optional[Dict[str, Any]] = None,
+) -> List[float]:
+    """P(PROTEST) from the distilled encoder, length-sorted batches, one pass per sequence."""
+    import torch
+
+    tokenizer, model = _get_distilled()
+    t0 = time.perf_counter()
+    out: List[float] = [0.0] * len(sequences)
+    order = sorted(range(len(sequences)), key=lambda j: len(sequences[j]))
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        enc = tokenizer(
+            [sequences[j] for j in bucket],
+            truncation=True,
+            max_length=DISTILLED_MAX_LENGTH,
+            padding=True,
+            return_tensors="pt",
+        )
+        t_batch = time.perf_counter()
+        with torch.inference_mode():
+            probs = torch.sigmoid(model(**enc).logits[:, 0]).tolist()
+        _record_batch(stats, enc["attention_mask"], time.perf_counter() - t_batch)
+        for j, p in zip(bucket, probs):
+            out[j] = float(p)
+    if stats is not None:
+        stats["docs"] = stats.get("docs", 0) + len(sequences)
+        stats["seconds"] = stats.get("seconds", 0.0) + (time.perf_counter() - t0)
+    return out
+
+
+def _classify_via_server(
+    articles: Sequence[Tuple[str, str]],
+    protest_threshold: float,
+    max_chars: int,
+    min_length: int,
+    stats: Optional[Dict[str, Any]],
+    windows: Optional[Dict[str, Any]] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """POST the articles to hf_server.py and return its results.
+
+    `windows` (window_tokens / overlap / aggregate / max_windows) asks the
+    server for classify_articles_windowed instead.
+    """
+    from urllib.request import Request, urlopen
+
+    t0 = time.perf_counter()
+    request = {
+        "articles": [[title or "", text or ""] for title, text in articles],
+        "protest_threshold": protest_threshold,
+        "max_chars": max_chars,
+        "min_length": min_length,
+    }
+    if windows is not None:
+        request["windows"] = windows
+    body = json.dumps(request).encode("utf-8")
+    req = Request(f"{HF_SERVER_URL.rstrip('/')}/classify", data=body,
+                  headers={"Content-Type": "application/json"}, method="POST")
+    with urlopen(req, timeout=HF_SERVER_TIMEOUT) as resp:
+        payload = json.loads(resp.read())
+    results = payload["results"]
+    if len(results) != len(articles):
+        raise ValueError(f"hf_server returned {len(results)} results for {len(articles)} articles")
+
+    if stats is not None:
+        stats["docs"] = stats.get("docs", 0) + sum(r is not None for r in results)
+        stats["seconds"] = stats.get("seconds", 0.0) + (time.perf_counter() - t0)
+        if windows is not None:
+            stats["windows"] = stats.get("windows", 0) + sum(r["n_windows"] for r in results if r)
+            stats["tokens"] = stats.get("tokens", 0) + sum(r["tokens"] for r in results if r)
+    return results
+
+
+def classify_article_with_hf(
+    title: str,
+    text: str,
+    *,
+    protest_threshold: float = 0.65,
+    max_chars: int = 4000,
+    min_length: int = 200,
+) -> Optional[Dict[str, Any]]:
+    """Classify a document as PROTEST / NOT PROTEST.
+
+    Returns None when text is missing/too short.
+
+    Returns dict keys:
+      - confidence: float  (P(PROTEST))
+      - label: int         (1 for PROTEST, 0 for NOT PROTEST)
+      - label_name: str    ("PROTEST" | "NOT PROTEST")
+      - top_label: str     (argmax label from the ZSC output)
+      - top_score: float
+      - model: str
+      - reason: str        (human readable; includes threshold for transparency)
+    """
+    # Same math as the zero-shot pipeline, but goes through the selected backend.
+    return classify_articles_with_hf(
+        [(title, text)],
+        protest_threshold=protest_threshold,
+        max_chars=max_chars,
+        min_length=min_length,
+    )[0]
+
+
+def classify_articles_with_hf(
+    articles: Sequence[Tuple[str, str]],
+    *,
+    protest_threshold: float = 0.65,
+    max_chars: int = 4000,
+    min_length: int = 200,
+    batch_size: int = INFER_BATCH_SIZE,
+    stats: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+) -> List[Optional[Dict[str, Any]]]:
+    """Batched version of classify_article_with_hf.
+
+    `articles` is a sequence of (title, text) pairs. The result list has the
+    same order and length; each entry is what classify_article_with_hf would
+    return for that article (None for missing/too short text).
+
+    Articles are tokenized together, sorted by token length and cut into
+    buckets of `batch_size` documents so each forward pass pads to a similar
+    length.
+
+    Raw logits are looked up in the persistent cache first (see hf_cache.py);
+    only cache misses are sent to the model. Pass use_cache=False to bypass it.
+
+    With HF_SERVER_URL set, the call is forwarded to hf_server.py, which
+    batches it together with other clients' requests (batch_size / use_cache
+    are then the server's).
+
+    If `stats` is given it is updated in place with running totals:
+      - docs: int          (documents sent to the model)
+      - seconds: float     (wall time spent tokenizing + in forward passes)
+      - cache_hits: int
+      - cache_misses: int
+      - batches, real_tokens, padded_tokens: int  (per forward pass)
+      - forward_ms: list of float                 (latency of each forward pass)
+    """
+    if HF_SERVER_URL:
+        return _classify_via_server(articles, protest_threshold, max_chars, min_length, stats)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(articles)
+
+    todo: List[int] = []
+    sequences: List[str] = []
+    for i, (title, text) in enumerate(articles):
+        if not text or len(text.strip()) < min_length:
+            continue
+        todo.append(i)
+        sequences.append(_build_sequence(title or "", text, max_chars))
+
+    if not sequences:
+        return results
+
+    if HF_BACKEND == "distilled":
+        probs = distilled_scores(sequences, batch_size=batch_size, stats=stats)
+        for j, p in enumerate(probs):
+            ranked = sorted(zip(CANDIDATE_LABELS, [p, 1.0 - p]), key=lambda x: -x[1])
+            results[todo[j]] = _result_from_output(
+                [label for label, _ in ranked],
+                [score for _, score in ranked],
+                protest_threshold,
+            )
+        return results
+
+    if HF_BACKEND == "biencoder":
+        from biencoder import score_texts
+
+        t0 = time.perf_counter()
+        # The article text alone (no title), so the stored embedding is the
+        # one topic_modeling.py would compute for the same document.
+        probs, embeddings = score_texts([articles[i][1] for i in todo])
+        for j, p in enumerate(probs):
+            ranked = sorted(zip(CANDIDATE_LABELS, [p, 1.0 - p]), key=lambda x: -x[1])
+            res = _result_from_output(
+                [label for label, _ in ranked],
+                [score for _, score in ranked],
+                protest_threshold,
+            )
+            res["embedding"] = embeddings[j].tolist()
+            results[todo[j]] = res
+        if stats is not None:
+            stats["docs"] = stats.get("docs", 0) + len(todo)
+            stats["seconds"] = stats.get("seconds", 0.0) + (time.perf_counter() - t0)
+        return results
+
+    logits_by_seq = _cached_logits(sequences, batch_size=batch_size, use_cache=use_cache, stats=stats)
+
+    for j, logits in enumerate(logits_by_seq):
+        ranked = sorted(zip(CANDIDATE_LABELS, _label_probs(logits)), key=lambda x: -x[1])
+        results[todo[j]] = _result_from_output(
+            [label for label, _ in ranked],
+            [score for _, score in ranked],
+            protest_threshold,
+        )
+
+    return results
+
+
+# ----------------------------
+# Sliding-window mode
+# ----------------------------
+WINDOW_TOKENS = 400   # premise tokens per window
+WINDOW_OVERLAP = 64   # tokens shared by consecutive windows
+WINDOW_AGGREGATES = ("max", "mean")
+
+
+def check_window_args(window_tokens: int, overlap: int) -> None:
+    """Windows must advance: overlap >= window_tokens would mean one window per token."""
+    if window_tokens < 1 or not 0 <= overlap < window_tokens:
+        raise ValueError(f"Need 0 <= overlap < window_tokens (got overlap={overlap}, window_tokens={window_tokens}).")
+
+
+def _token_windows(ids: List[int], window_tokens: int, overlap: int) -> List[List[int]]:
+    """Overlapping slices of ids; always at least one (possibly short) window."""
+    step = max(window_tokens - overlap, 1)
+    return [ids[start:start + window_tokens] for start in range(0, max(len(ids) - overlap, 1), step)]
+
+
+def _window_logits(windows: List[List[int]], stats: Optional[Dict[str, Any]] = None) -> List[List[List[float]]]:
+    """Raw NLI logits per premise window, shape (len(windows), n_hypotheses, n_classes).
+
+    Builds model inputs straight from token ids, so articles are tokenized once.
+    """
+    import torch
+    from transformers import BatchEncoding
+
+    tok = _get_tokenizer()
+    hyp_ids = [
+        tok(HYPOTHESIS_TEMPLATE.format(label), add_special_tokens=False)["input_ids"]
+        for label in _hypothesis_labels()
+    ]
+    rows = [tok.build_inputs_with_special_tokens(w, h) for w in windows for h in hyp_ids]
+    width = max(len(r) for r in rows)
+    input_ids = torch.full((len(rows), width), tok.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+    for i, r in enumerate(rows):
+        input_ids[i, :len(r)] = torch.tensor(r)
+        attention_mask[i, :len(r)] = 1
+
+    enc = BatchEncoding({"input_ids": input_ids, "attention_mask": attention_mask})
+    logits = _forward_logits(enc, stats)
+    return logits.reshape(len(windows), len(hyp_ids), -1).tolist()
+
+
+def classify_articles_windowed(
+    articles: Sequence[Tuple[str, str]],
+    *,
+    protest_threshold: float = 0.65,
+    min_length: int = 200,
+    window_tokens: int = WINDOW_TOKENS,
+    overlap: int = WINDOW_OVERLAP,
+    aggregate: str = "max",
+    max_windows: int = 0,
+    batch_size: int = INFER_BATCH_SIZE,
+    stats: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+) -> List[Optional[Dict[str, Any]]]:
+    """Classify whole articles with overlapping token windows.
+
+    Each article (title + full text, no max_chars cut) is tokenized once and
+    split into windows of `window_tokens` tokens sharing `overlap` tokens. The
+    windows of all articles are scored together in length-sorted batches of
+    `batch_size` windows; P(PROTEST) per article is the max or mean over its
+    windows. max_windows > 0 keeps only the first N windows per article.
+
+    Same result dict as classify_articles_with_hf, plus:
+      - n_windows: int
+      - tokens: int   (real model tokens spent on the article, all hypotheses)
+
+    stats (if given) also accumulates "windows" and "tokens".
+
+    With HF_SERVER_URL set, the call is forwarded to hf_server.py like
+    classify_articles_with_hf (batch_size / use_cache are then the server's).
+    """
+    if aggregate not in WINDOW_AGGREGATES:
+        raise ValueError(f"aggregate must be one of: {', '.join(WINDOW_AGGREGATES)}")
+    check_window_args(window_tokens, overlap)
+    if HF_SERVER_URL:
+        windows = {"window_tokens": window_tokens, "overlap": overlap, "aggregate": aggregate, "max_windows": max_windows}
+        return _classify_via_server(articles, protest_threshold, 0, min_length, stats, windows=windows)
+    if HF_BACKEND in ("distilled", "biencoder"):
+        raise ValueError("Sliding windows need an NLI backend (torch / onnx / onnx-int8).")
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(articles)
+
+    todo: List[int] = []
+    premises: List[str] = []
+    for i, (title, text) in enumerate(articles):
+        if not text or len(text.strip()) < min_length:
+            continue
+        todo.append(i)
+        premises.append(f"Title: {title or ''}\n\nArticle:\n{text}")
+    if not premises:
+        return results
+
+    t0 = time.perf_counter()
+    tok = _get_tokenizer()
+    n_hyp = len(_hypothesis_labels())
+    # Room for the hypothesis and the special tokens of a premise/hypothesis pair.
+    hyp_len = max(
+        len(tok(HYPOTHESIS_TEMPLATE.format(label), add_special_tokens=False)["input_ids"])
+        for label in _hypothesis_labels()
+    )
+    window_tokens = min(window_tokens, tok.model_max_length - hyp_len - 4)
+    check_window_args(window_tokens, overlap)  # the model-length cap may have shrunk the window
+
+    all_ids = tok(premises, add_special_tokens=False)["input_ids"]
+    windows: List[List[int]] = []
+    owner: List[int] = []
+    for j, ids in enumerate(all_ids):
+        doc_windows = _token_windows(ids, window_tokens, overlap)
+        if max_windows:
+            doc_windows = doc_windows[:max_windows]
+        windows.extend(doc_windows)
+        owner.extend([j] * len(doc_windows))
+
+    cache = _get_cache() if use_cache else None
+    keys = [_cache_key("ids:" + ",".join(map(str, w))) for w in windows]
+    window_logits: List[Optional[List[List[float]]]] = [None] * len(windows)
+    if cache is not None:
+        cached = cache.get_many(keys)
+        window_logits = [cached.get(k) for k in keys]
+    misses = [w for w in range(len(windows)) if window_logits[w] is None]
+
+    order = sorted(misses, key=lambda w: len(windows[w]))
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        batch_logits = _window_logits([windows[w] for w in bucket], stats)
+        for w, row in zip(bucket, batch_logits):
+            window_logits[w] = row
+        if cache is not None:
+            cache.put_many((keys[w], row) for w, row in zip(bucket, batch_logits))
+
+    per_doc: List[List[float]] = [[] for _ in premises]
+    tokens = [0] * len(premises)
+    for w, logits in enumerate(window_logits):
+        per_doc[owner[w]].append(_label_probs(logits)[0])
+        tokens[owner[w]] += n_hyp * (len(windows[w]) + hyp_len + 4)
+
+    for j, probs in enumerate(per_doc):
+        p = max(probs) if aggregate == "max" else sum(probs) / len(probs)
+        ranked = sorted(zip(CANDIDATE_LABELS, [p, 1.0 - p]), key=lambda x: -x[1])
+        res = _result_from_output(
+            [label for label, _ in ranked],
+            [score for _, score in ranked],
+            protest_threshold,
+        )
+        res["reason"] += f" [windows={len(probs)} agg={aggregate}]"
+        res["n_windows"] = len(probs)
+        res["tokens"] = tokens[j]
+        results[todo[j]] = res
+
+    if stats is not None:
+        stats["docs"] = stats.get("docs", 0) + len(premises)
+        stats["seconds"] = stats.get("seconds", 0.0) + (time.perf_counter() - t0)
+        stats["windows"] = stats.get("windows", 0) + len(windows)
+        stats["tokens"] = stats.get("tokens", 0) + sum(tokens)
+        stats["cache_hits"] = stats.get("cache_hits", 0) + len(windows) - len(misses)
+        stats["cache_misses"] = stats.get("cache_misses", 0) + len(misses)
+
+    return results
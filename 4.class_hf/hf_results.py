@@ -1,4 +1,9 @@
 #!/usr/bin/env python3
+"""
+Diagnostics for the stored HF results in one $facet aggregation (one round trip,
+full collection, no sampling): counts by hf_label_name and hf_status, counts
+below / near / above THRESHOLD, and a $bucket histogram of hf_confidence.
+"""
 import os
 from pymongo import MongoClient
 import pandas as pd
@@ -11,62 +16,97 @@ COLLECTION_NAME = "Texts"
 
 THRESHOLD = 0.57
 WINDOW = 0.02          # “near threshold” = +/- 0.02
-SAMPLE_N = 200000      # for plotting (avoid pulling millions into memory)
+N_BINS = 50            # histogram bins over [0, 1]
 
-def agg_to_df(coll, pipeline):
-    return pd.DataFrame(list(coll.aggregate(pipeline, allowDiskUse=True)))
+def _bin_edges(n_bins: int):
+    # $bucket bins are [lower, upper); nudge the last edge so hf_confidence == 1.0 lands in the top bin.
+    edges = [round(i / n_bins, 10) for i in range(n_bins)]
+    return edges + [1.0 + 1e-9]
+
+def diagnostics_pipeline(threshold: float, window: float, n_bins: int):
+    lo, hi = threshold - window, threshold + window
+    is_scored = {"$match": {"hf_confidence": {"$type": "number"}}}
+
+    def count_if(cond):
+        return {"$sum": {"$cond": [cond, 1, 0]}}
+
+    return [
+        # $facet output is capped at 16 MB: don't carry text / embeddings into it
+        {"$project": {"_id": 0, "hf_label_name": 1, "hf_confidence": 1, "hf_status": 1, "paper": 1}},
+        {"$facet": {
+            "by_label": [
+                {"$match": {"hf_label_name": {"$exists": True}}},
+                {"$group": {"_id": "$hf_label_name", "n": {"$sum": 1}}},
+                {"$sort": {"n": -1}},
+            ],
+            "by_status": [
+                {"$match": {"hf_status": {"$exists": True}}},
+                {"$group": {"_id": "$hf_status", "n": {"$sum": 1}}},
+                {"$sort": {"n": -1}},
+            ],
+            "threshold": [
+                is_scored,
+                {"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "below": count_if({"$lt": ["$hf_confidence", threshold]}),
+                    "above": count_if({"$gte": ["$hf_confidence", threshold]}),
+                    "near": count_if({"$and": [{"$gte": ["$hf_confidence", lo]}, {"$lt": ["$hf_confidence", hi]}]}),
+                }},
+            ],
+            "histogram": [
+                is_scored,
+                {"$bucket": {
+                    "groupBy": "$hf_confidence",
+                    "boundaries": _bin_edges(n_bins),
+                    "default": "out_of_range",
+                    "output": {"n": {"$sum": 1}},
+                }},
+            ],
+        }},
+    ]
 
 def main():
     client = MongoClient(MONGO_URI)
     coll = client[DB_NAME][COLLECTION_NAME]
 
+    res = next(coll.aggregate(diagnostics_pipeline(THRESHOLD, WINDOW, N_BINS), allowDiskUse=True))
+
     # 1) Counts by final label
-    df_label = agg_to_df(coll, [
-        {"$match": {"hf_label_name": {"$exists": True}}},
-        {"$group": {"_id": "$hf_label_name", "n": {"$sum": 1}}},
-        {"$sort": {"n": -1}},
-    ])
+    df_label = pd.DataFrame(res["by_label"])
     print("\n=== Counts by hf_label_name ===")
     print(df_label.to_string(index=False) if not df_label.empty else "No hf_label_name found.")
 
     # 2) Counts by status
-    df_status = agg_to_df(coll, [
-        {"$match": {"hf_status": {"$exists": True}}},
-        {"$group": {"_id": "$hf_status", "n": {"$sum": 1}}},
-        {"$sort": {"n": -1}},
-    ])
+    df_status = pd.DataFrame(res["by_status"])
     print("\n=== Counts by hf_status ===")
     print(df_status.to_string(index=False) if not df_status.empty else "No hf_status found.")
 
     # 3) Near-threshold counts
     lo, hi = THRESHOLD - WINDOW, THRESHOLD + WINDOW
-    n_near = coll.count_documents({"hf_confidence": {"$gte": lo, "$lt": hi}})
-    n_below = coll.count_documents({"hf_confidence": {"$lt": THRESHOLD}})
-    n_above = coll.count_documents({"hf_confidence": {"$gte": THRESHOLD}})
-    n_total_scored = coll.count_documents({"hf_confidence": {"$type": "number"}})
+    t = res["threshold"][0] if res["threshold"] else {"total": 0, "below": 0, "above": 0, "near": 0}
 
     print(f"\n=== Confidence sanity check ===")
-    print(f"Total with hf_confidence: {n_total_scored}")
-    print(f"Below threshold (< {THRESHOLD}): {n_below}")
-    print(f"At/above threshold (>= {THRESHOLD}): {n_above}")
-    print(f"Near threshold in [{lo:.2f}, {hi:.2f}): {n_near}")
-
-    # 4) Plot distribution (sampled)
-    cursor = coll.find(
-        {"hf_confidence": {"$type": "number"}},
-        {"_id": 0, "hf_confidence": 1}
-    ).limit(SAMPLE_N)
+    print(f"Total with hf_confidence: {t['total']}")
+    print(f"Below threshold (< {THRESHOLD}): {t['below']}")
+    print(f"At/above threshold (>= {THRESHOLD}): {t['above']}")
+    print(f"Near threshold in [{lo:.2f}, {hi:.2f}): {t['near']}")
 
-    vals = [d["hf_confidence"] for d in cursor if "hf_confidence" in d]
+    # 4) Plot distribution (all scored docs, binned server-side)
+    bins = [b for b in res["histogram"] if b["_id"] != "out_of_range"]
+    out_of_range = sum(b["n"] for b in res["histogram"] if b["_id"] == "out_of_range")
+    if out_of_range:
+        print(f"Outside [0, 1]: {out_of_range}")
 
-    if not vals:
+    if not bins:
         print("\nNo hf_confidence values to plot.")
         return
 
+    width = 1.0 / N_BINS
     plt.figure()
-    plt.hist(vals, bins=50)
+    plt.bar([b["_id"] for b in bins], [b["n"] for b in bins], width=width, align="edge")
     plt.axvline(THRESHOLD)
-    plt.title("Distribution of hf_confidence (sampled)")
+    plt.title(f"Distribution of hf_confidence (n={t['total']})")
     plt.xlabel("hf_confidence = P(PROTEST)")
     plt.ylabel("Count")
     plt.show()
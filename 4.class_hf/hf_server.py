@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+hf_server.py
+
+Long-lived local inference server for the protest classifier.
+
+Loads the model once and keeps it warm. Clients POST articles to /classify;
+a batcher thread coalesces concurrent requests (from any number of clients)
+into micro-batches before calling classify_articles_with_hf, so ad hoc
+scripts and batch jobs share one loaded model and still get batched forward
+passes.
+
+When HF_SERVER_URL is set (e.g. http://127.0.0.1:8765), hf_class sends
+classify_article(s)_with_hf and classify_articles_windowed calls here instead
+of loading the model itself.
+
+Endpoints:
+  POST /classify  {"articles": [[title, text], ...], "protest_threshold": 0.65,
+                   "max_chars": 4000, "min_length": 200,
+                   "windows": {"window_tokens": 400, "overlap": 64,      (optional: sliding-window
+                               "aggregate": "max", "max_windows": 0}}     mode, max_chars ignored)
+                  -> {"results": [ {...} | null, ... ]}
+  GET  /health    -> {"status": "ok", "requests": n, "batches": n, "docs": n}
+
+USAGE:
+  python hf_server.py --port 8765 --max_batch_docs 32 --max_wait_ms 20
+  HF_SERVER_URL=http://127.0.0.1:8765 python run_hf.py --hybrid
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+# This process *is* the server: never forward calls to ourselves.
+os.environ.pop("HF_SERVER_URL", None)
+
+import hf_class  # noqa: E402
+
+
+class _Pending:
+    """One client request waiting for its slice of a micro-batch."""
+
+    def __init__(self, articles: List[List[str]], params: Dict[str, Any]):
+        self.articles = [(a[0] or "", a[1] or "") for a in articles]
+        self.params = params
+        self.results: List[Any] = []
+        self.error: Exception = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Collect requests for up to max_wait_ms (or max_batch_docs docs), run them together."""
+
+    def __init__(self, max_batch_docs: int, max_wait_ms: float, infer_batch: int):
+        self.max_batch_docs = max_batch_docs
+        self.max_wait = max_wait_ms / 1000.0
+        self.infer_batch = infer_batch
+        self.inbox: "queue.Queue[_Pending]" = queue.Queue()
+        self.counters = {"requests": 0, "batches": 0, "docs": 0}
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, pending: _Pending) -> _Pending:
+        self.inbox.put(pending)
+        pending.done.wait()
+        return pending
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self.inbox.get()]
+            n_docs = len(batch[0].articles)
+            deadline = time.perf_counter() + self.max_wait
+            while n_docs < self.max_batch_docs:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self.inbox.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(nxt)
+                n_docs += len(nxt.articles)
+            self._run(batch)
+
+    def _run(self, batch: List[_Pending]) -> None:
+        # Requests with different parameters cannot share a call.
+        groups: Dict[tuple, List[_Pending]] = {}
+        for p in batch:
+            groups.setdefault(tuple(sorted(p.params.items())), []).append(p)
+
+        for key, members in groups.items():
+            articles = [a for p in members for a in p.articles]
+            params = dict(key)
+            classify = hf_class.classify_articles_with_hf
+            if "window_tokens" in params:
+                classify = hf_class.classify_articles_windowed
+            try:
+                results = classify(articles, batch_size=self.infer_batch, **params)
+            except Exception as e:
+                for p in members:
+                    p.error = e
+                    p.done.set()
+                continue
+            start = 0
+            for p in members:
+                p.results = results[start:start + len(p.articles)]
+                start += len(p.articles)
+                p.done.set()
+
+        self.counters["requests"] += len(batch)
+        self.counters["batches"] += 1
+        self.counters["docs"] += sum(len(p.articles) for p in batch)
+
+
+def make_handler(batcher: MicroBatcher):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "backend": hf_class.HF_BACKEND,
+                                 "nli_mode": hf_class.HF_NLI_MODE, **batcher.counters})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/classify":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                params = {
+                    "protest_threshold": float(req.get("protest_threshold", 0.65)),
+                    "max_chars": int(req.get("max_chars", 4000)),
+                    "min_length": int(req.get("min_length", 200)),
+                }
+                windows = req.get("windows")
+                if windows is not None:
+                    del params["max_chars"]  # windowed mode scores the whole article
+                    params.update({
+                        "window_tokens": int(windows.get("window_tokens", hf_class.WINDOW_TOKENS)),
+                        "overlap": int(windows.get("overlap", hf_class.WINDOW_OVERLAP)),
+                        "aggregate": str(windows.get("aggregate", "max")),
+                        "max_windows": int(windows.get("max_windows", 0)),
+                    })
+                    hf_class.check_window_args(params["window_tokens"], params["overlap"])
+                    if params["aggregate"] not in hf_class.WINDOW_AGGREGATES:
+                        raise ValueError(f"aggregate must be one of: {', '.join(hf_class.WINDOW_AGGREGATES)}")
+                pending = batcher.submit(_Pending(req["articles"], params))
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {"error": f"bad request: {e}"})
+                return
+            if pending.error is not None:
+                self._send(500, {"error": str(pending.error)})
+            else:
+                self._send(200, {"results": pending.results})
+
+        def log_message(self, fmt, *args):
+            pass  # keep the console for the [hf_server] lines
+
+    return Handler
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", type=str, default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--max_batch_docs", type=int, default=32, help="Docs per micro-batch across clients.")
+    p.add_argument("--max_wait_ms", type=float, default=20.0, help="How long the first request waits for company.")
+    p.add_argument("--infer_batch", type=int, default=hf_class.INFER_BATCH_SIZE)
+    p.add_argument("--backend", type=str, default=None, choices=list(hf_class.BACKENDS))
+    p.add_argument("--nli_mode", type=str, default=None, choices=list(hf_class.NLI_MODES))
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.backend:
+        hf_class.set_backend(args.backend)
+    if args.nli_mode:
+        hf_class.set_nli_mode(args.nli_mode)
+
+    # Pay the model load + first-batch cost before accepting requests.
+    hf_class.warmup()
+
+    batcher = MicroBatcher(args.max_batch_docs, args.max_wait_ms, args.infer_batch)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher))
+    print(f"[hf_server] {hf_class.HF_MODEL_NAME} backend={hf_class.HF_BACKEND} "
+          f"nli_mode={hf_class.HF_NLI_MODE} listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
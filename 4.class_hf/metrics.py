@@ -13,6 +13,11 @@ It uses the model prediction primarily from hf_reason ("-> PROTEST"/"-> NOT_PROT
 falling back to hf_label_name when hf_reason is missing.
 
 You can optionally export a per-document CSV report.
+
+EVAL_MODE = "server" computes the confusion matrix inside MongoDB (one
+$facet aggregation: overall, by paper, by COVID period) so documents never
+cross the network; only the optional CSV export streams rows, lazily.
+EVAL_MODE = "client" is the original per-document loop.
 """
 
 from __future__ import annotations
@@ -20,7 +25,7 @@ from __future__ import annotations
 import re
 import csv
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple, List
+from typing import Any, Dict, Iterator, Optional, Tuple, List
 
 from pymongo import MongoClient
 
@@ -43,6 +48,16 @@ AUTO_DETECT_HUMAN_FIELD = True
 EXPORT_CSV = True
 CSV_PATH = "eval_report_protest_classifier.csv"
 
+# "server": aggregate TP/FP/TN/FN in MongoDB; "client": per-document loop in Python
+EVAL_MODE = "server"
+
+# COVID periods by publish_date (end EXCLUSIVE), same cut points as 7.1.plots/protest_covid_period.py
+COVID_PERIODS = [
+    ("Pre-COVID", "2020-03-11"),
+    ("COVID", "2022-02-24"),
+]
+POST_COVID_LABEL = "Post-COVID"
+
 
 # ----------------------------
 # Helpers
@@ -165,6 +180,194 @@ def update_confusion(conf: Confusion, y_true: int, y_pred: int) -> None:
     elif y_true == 1 and y_pred == 0:
         conf.fn += 1
 
+# ----------------------------
+# Server-side evaluation (aggregation expressions mirroring the helpers above)
+# ----------------------------
+def _binary_label_expr(value: Any) -> Dict[str, Any]:
+    """Aggregation version of to_binary_label(): 1, 0 or null."""
+    s = {"$toUpper": {"$trim": {"input": value}}}
+    is_str = {"$eq": [{"$type": value}, "string"]}
+    return {"$switch": {
+        "branches": [
+            {"case": {"$eq": [{"$type": value}, "bool"]}, "then": {"$cond": [value, 1, 0]}},
+            {"case": {"$and": [{"$isNumber": value}, {"$in": [value, [0, 1]]}]}, "then": {"$toInt": value}},
+            {"case": {"$and": [is_str, {"$regexMatch": {"input": s, "regex": "NOT"}},
+                               {"$regexMatch": {"input": s, "regex": "PROTEST"}}]}, "then": 0},
+            {"case": {"$and": [is_str, {"$regexMatch": {"input": s, "regex": "PROTEST"}}]}, "then": 1},
+            {"case": {"$and": [is_str, {"$in": [s, ["0", "NO", "FALSE"]]}]}, "then": 0},
+            {"case": {"$and": [is_str, {"$in": [s, ["1", "YES", "TRUE"]]}]}, "then": 1},
+        ],
+        "default": None,
+    }}
+
+def _first_label_expr(candidates: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """{"y": label, "f": source} for the first candidate whose label is 0/1, else y=null."""
+    expr: Dict[str, Any] = {"y": None, "f": "missing"}
+    for name, label in reversed(candidates):
+        expr = {"$let": {
+            "vars": {"v": label},
+            "in": {"$cond": [{"$in": ["$$v", [0, 1]]}, {"y": "$$v", "f": name}, expr]},
+        }}
+    return expr
+
+def _human_label_expr() -> Dict[str, Any]:
+    if HUMAN_LABEL_FIELD:
+        fields = [HUMAN_LABEL_FIELD]
+    elif AUTO_DETECT_HUMAN_FIELD:
+        fields = HUMAN_FIELD_CANDIDATES
+    else:
+        fields = []
+    return _first_label_expr([(f, _binary_label_expr(f"${f}")) for f in fields])
+
+def _prediction_expr() -> Dict[str, Any]:
+    """Aggregation version of get_model_prediction(): hf_reason arrow, then hf_label_name, then hf_label."""
+    arrow = {"$regexFind": {
+        "input": "$hf_reason",
+        "regex": r"->\s*(PROTEST|NOT[_\s]?PROTEST)\b",
+        "options": "i",
+    }}
+    from_reason = {"$cond": [
+        {"$eq": [{"$type": "$hf_reason"}, "string"]},
+        {"$let": {
+            "vars": {"m": arrow},
+            "in": {"$cond": [
+                {"$eq": ["$$m", None]},
+                None,
+                {"$cond": [{"$eq": [{"$toUpper": {"$arrayElemAt": ["$$m.captures", 0]}}, "PROTEST"]}, 1, 0]},
+            ]},
+        }},
+        None,
+    ]}
+    return _first_label_expr([
+        ("hf_reason", from_reason),
+        ("hf_label_name", _binary_label_expr("$hf_label_name")),
+        ("hf_label", _binary_label_expr("$hf_label")),
+    ])
+
+def _period_expr() -> Dict[str, Any]:
+    """COVID period from publish_date (string or date; compared as YYYY-MM-DD)."""
+    day = {"$substrCP": [{"$toString": "$publish_date"}, 0, 10]}
+    return {"$cond": [
+        {"$in": [{"$type": "$publish_date"}, ["missing", "null"]]},
+        "UNKNOWN",
+        {"$switch": {
+            "branches": [{"case": {"$lt": [day, end]}, "then": name} for name, end in COVID_PERIODS],
+            "default": POST_COVID_LABEL,
+        }},
+    ]}
+
+def _confusion_group(key: Any) -> Dict[str, Any]:
+    def cell(t: int, p: int) -> Dict[str, Any]:
+        return {"$sum": {"$cond": [{"$and": [{"$eq": ["$y_true", t]}, {"$eq": ["$y_pred", p]}]}, 1, 0]}}
+    return {"$group": {"_id": key, "tp": cell(1, 1), "fp": cell(0, 1), "tn": cell(0, 0), "fn": cell(1, 0)}}
+
+def evaluation_pipeline(query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One aggregation: overall counts, confusion by paper / COVID period, label-source counts."""
+    usable = {"$match": {"y_true": {"$in": [0, 1]}, "y_pred": {"$in": [0, 1]}}}
+    return [
+        {"$match": query},
+        {"$project": {"human": _human_label_expr(), "pred": _prediction_expr(), "paper": 1, "publish_date": 1}},
+        {"$project": {
+            "y_true": "$human.y",
+            "y_pred": "$pred.y",
+            "human_field": "$human.f",
+            "pred_source": "$pred.f",
+            "paper": {"$ifNull": ["$paper", "UNKNOWN"]},
+            "period": _period_expr(),
+        }},
+        {"$facet": {
+            "counts": [{"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "no_human": {"$sum": {"$cond": [{"$in": ["$y_true", [0, 1]]}, 0, 1]}},
+                "no_pred": {"$sum": {"$cond": [
+                    {"$and": [{"$in": ["$y_true", [0, 1]]}, {"$not": [{"$in": ["$y_pred", [0, 1]]}]}]}, 1, 0,
+                ]}},
+            }}],
+            "overall": [usable, _confusion_group(None)],
+            "by_paper": [usable, _confusion_group("$paper"), {"$sort": {"_id": 1}}],
+            "by_period": [usable, _confusion_group("$period"), {"$sort": {"_id": 1}}],
+            "human_fields": [usable, {"$group": {"_id": "$human_field", "n": {"$sum": 1}}}, {"$sort": {"n": -1}}],
+            "pred_sources": [usable, {"$group": {"_id": "$pred_source", "n": {"$sum": 1}}}, {"$sort": {"n": -1}}],
+        }},
+    ]
+
+def _metric_row(name: str, c: Dict[str, Any]) -> str:
+    tp, fp, tn, fn = (int(c.get(k, 0)) for k in ("tp", "fp", "tn", "fn"))
+    precision, recall = safe_div(tp, tp + fp), safe_div(tp, tp + fn)
+    return (
+        f"  {name:<28} n={tp + fp + tn + fn:<6} TP={tp:<5} FP={fp:<5} TN={tn:<5} FN={fn:<5} "
+        f"P={precision:.3f} R={recall:.3f} F1={fbeta(precision, recall, 1.0):.3f} F0.5={fbeta(precision, recall, 0.5):.3f}"
+    )
+
+def evaluate_server_side(col, query: Dict[str, Any]) -> Dict[str, Any]:
+    """Run evaluation_pipeline() and print the same summary as the client loop, plus breakdowns."""
+    res = next(col.aggregate(evaluation_pipeline(query), allowDiskUse=True))
+    counts = res["counts"][0] if res["counts"] else {"total": 0, "no_human": 0, "no_pred": 0}
+    overall = res["overall"][0] if res["overall"] else {}
+
+    print("\n=== Evaluation summary (positive class = PROTEST, computed server-side) ===")
+    print(f"Total docs scanned: {counts['total']}")
+    print(f"Used in evaluation: {counts['total'] - counts['no_human'] - counts['no_pred']}")
+    print(f"Skipped (no human label): {counts['no_human']}")
+    print(f"Skipped (no prediction fields): {counts['no_pred']}")
+
+    print("\nHuman label fields used:")
+    for r in res["human_fields"]:
+        print(f"  {r['_id']}: {r['n']}")
+    print("\nPrediction source used:")
+    for r in res["pred_sources"]:
+        print(f"  {r['_id']}: {r['n']}")
+
+    print("\nOverall:")
+    print(_metric_row("ALL", overall))
+    print("\nBy paper:")
+    for r in res["by_paper"]:
+        print(_metric_row(str(r["_id"]), r))
+    print("\nBy COVID period:")
+    for r in res["by_period"]:
+        print(_metric_row(str(r["_id"]), r))
+    return res
+
+def iter_report_rows(col, query: Dict[str, Any], projection: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Per-document CSV rows, streamed from the cursor (evaluable docs only)."""
+    for doc in col.find(query, projection).batch_size(1000):
+        y_true, human_field_used = get_human_label(doc, HUMAN_LABEL_FIELD)
+        if y_true is None:
+            continue
+        y_pred, pred_source = get_model_prediction(doc)
+        if y_pred is None:
+            continue
+        yield {
+            "url": doc.get("_id"),
+            "title": doc.get("title"),
+            "paper": doc.get("paper"),
+            "publish_date": doc.get("publish_date"),
+            "y_true": y_true,
+            "y_pred": y_pred,
+            "human_field_used": human_field_used,
+            "pred_source": pred_source,
+            "hf_label_name": doc.get("hf_label_name"),
+            "hf_reason": doc.get("hf_reason"),
+        }
+
+def export_csv(rows: Iterator[Dict[str, Any]], path: str) -> int:
+    """Write rows as they arrive; returns the row count (no file if there are none)."""
+    n = 0
+    f = None
+    try:
+        for row in rows:
+            if f is None:
+                f = open(path, "w", newline="", encoding="utf-8")
+                w = csv.DictWriter(f, fieldnames=list(row.keys()))
+                w.writeheader()
+            w.writerow(row)
+            n += 1
+    finally:
+        if f is not None:
+            f.close()
+    return n
+
 def main() -> None:
     client = MongoClient(MONGO_URI)
     col = client[DB_NAME][EVAL_COLLECTION]
@@ -192,6 +395,13 @@ def main() -> None:
     if HUMAN_LABEL_FIELD:
         projection[HUMAN_LABEL_FIELD] = 1
 
+    if EVAL_MODE == "server":
+        evaluate_server_side(col, query)
+        if EXPORT_CSV:
+            n = export_csv(iter_report_rows(col, query, projection), CSV_PATH)
+            print(f"\nSaved per-document report ({n} rows) to: {CSV_PATH}")
+        return
+
     docs = list(col.find(query, projection))
 
     conf = Confusion()
@@ -0,0 +1,133 @@
+"""passages.py
+
+Salient-passage selection in front of the zero-shot classifier.
+
+Most of an article is background; only a few paragraphs say whether a protest
+actually happened. This module ranks paragraphs with cheap features and keeps
+the top-k (in their original order), so bart-large-mnli sees fewer tokens.
+
+Features per paragraph (all scaled to roughly 0..1):
+  - lexicon:  protest-lexicon hits per word
+  - title:    share of title keywords that occur in the paragraph
+  - position: earlier paragraphs score higher (news lead)
+  - semantic: cosine similarity to the protest hypothesis with
+              all-MiniLM-L6-v2 (optional; same model as topic_modeling.py)
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hf_class import HYPOTHESIS_TEMPLATE, PROTEST_LABEL
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+PROTEST_LEXICON = {
+    "protest", "protests", "protesters", "protestors", "protested", "protesting",
+    "demonstration", "demonstrations", "demonstrators", "demonstrated", "rally", "rallies",
+    "march", "marched", "marchers", "marching", "strike", "strikes", "striking", "walkout",
+    "picket", "pickets", "riot", "riots", "rioters", "rioting", "clashes", "clashed",
+    "activists", "campaigners", "blockade", "blockaded", "occupation", "occupied", "sit-in",
+    "vigil", "arrested", "arrests", "police", "crowd", "crowds", "placards", "banners",
+    "chanting", "chanted", "dispersed", "kettled", "extinction", "rebellion", "insulate",
+}
+
+WEIGHTS = {"lexicon": 1.0, "title": 0.5, "position": 0.5, "semantic": 1.0}
+
+_WORD_RE = re.compile(r"[a-z][a-z\-']+")
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "at", "by", "with", "from",
+    "as", "is", "are", "was", "were", "be", "been", "it", "its", "this", "that", "after",
+    "over", "into", "about", "says", "said", "new", "how", "why", "what", "who",
+}
+
+_embedder = None
+
+
+def _get_embedder():
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedder
+
+
+def split_paragraphs(text: str, min_chars: int = 40) -> List[str]:
+    """Split on line breaks; very short lines are glued to the next paragraph."""
+    paragraphs: List[str] = []
+    carry = ""
+    for line in re.split(r"\n+", text or ""):
+        line = line.strip()
+        if not line:
+            continue
+        line = f"{carry} {line}".strip() if carry else line
+        if len(line) < min_chars:
+            carry = line
+            continue
+        paragraphs.append(line)
+        carry = ""
+    if carry:
+        paragraphs.append(carry)
+    return paragraphs
+
+
+def _cheap_scores(title: str, paragraphs: List[str]) -> np.ndarray:
+    title_words = {w for w in _WORD_RE.findall(title.lower()) if w not in _STOPWORDS}
+    scores = np.zeros(len(paragraphs))
+    for i, para in enumerate(paragraphs):
+        words = _WORD_RE.findall(para.lower())
+        if not words:
+            continue
+        lexicon = sum(w in PROTEST_LEXICON for w in words) / len(words)
+        title_hit = len(title_words & set(words)) / len(title_words) if title_words else 0.0
+        position = 1.0 / (1.0 + i)
+        # lexicon density is small (a few %), so scale it to ~0..1
+        scores[i] = (
+            WEIGHTS["lexicon"] * min(lexicon * 20.0, 1.0)
+            + WEIGHTS["title"] * title_hit
+            + WEIGHTS["position"] * position
+        )
+    return scores
+
+
+def select_passages_batch(
+    articles: Sequence[Tuple[str, str]],
+    *,
+    k: int = 3,
+    use_embeddings: bool = False,
+) -> List[str]:
+    """Reduced text per article: its top-k paragraphs, original order kept.
+
+    Articles with k or fewer paragraphs are returned unchanged. With
+    use_embeddings=True the paragraphs of all articles are embedded in one
+    encode() call and the similarity to the protest hypothesis is added.
+    """
+    split = [split_paragraphs(text) for _, text in articles]
+    scores = [_cheap_scores(title or "", paras) for (title, _), paras in zip(articles, split)]
+
+    if use_embeddings:
+        flat = [p for paras in split if len(paras) > k for p in paras]
+        if flat:
+            embedder = _get_embedder()
+            hyp = embedder.encode([HYPOTHESIS_TEMPLATE.format(PROTEST_LABEL)], normalize_embeddings=True)[0]
+            emb = embedder.encode(flat, batch_size=64, normalize_embeddings=True)
+            sims = iter(np.clip(emb @ hyp, 0.0, 1.0))
+            for paras, sc in zip(split, scores):
+                if len(paras) > k:
+                    sc += WEIGHTS["semantic"] * np.array([next(sims) for _ in paras])
+
+    out: List[str] = []
+    for (_, text), paras, sc in zip(articles, split, scores):
+        if len(paras) <= k:
+            out.append(text)
+            continue
+        keep = sorted(np.argsort(-sc, kind="stable")[:k])
+        out.append("\n\n".join(paras[i] for i in keep))
+    return out
+
+
+def select_passages(title: str, text: str, *, k: int = 3, use_embeddings: bool = False) -> str:
+    return select_passages_batch([(title, text)], k=k, use_embeddings=use_embeddings)[0]
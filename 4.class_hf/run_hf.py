@@ -11,16 +11,41 @@ Stored fields per document (on success):
   - hf_reason: str              # includes threshold, but threshold is not stored as its own field
   - hf_status: "ok" | "skipped_short_text" | "error"
   - hf_error_message (only if error)
+  - hf_stage: "cheap" | "bart"  # only with --cascade: which stage decided the label
+  - hf_cheap_score: float       # only with --cascade: stage-1 score (cheap-stage docs have no hf_confidence)
+  - hf_windows / hf_tokens: int # only with --windows: windows scored, model tokens spent
+  - emb_minilm / emb_model      # only with --backend biencoder: article embedding (reused by topic_modeling.py)
 
 Threshold is passed via CLI (--threshold) or defaults to 0.65.
+With --paper_thresholds (map from threshold.py --per_paper --paper_json) the
+relabel step uses one threshold per paper, applied server-side in a single
+update_many. That step is not checkpointed: it is one idempotent statement,
+so an interrupted run simply repeats it (--relabel_only with a map creates
+no checkpoint at all; in --hybrid the checkpoint covers classification only).
+
+Every classification run also writes a summary (throughput, tokens/sec,
+padding waste, forward-pass latency percentiles, Mongo read/write time) to
+the `runs` collection and to hf_runs/run_<timestamp>_<run id>.json (dry runs:
+local file only, tagged _dryrun).
+
+Whenever a doc's hf_label_name changes (classification, relabel, per-paper
+relabel) its _id is upserted into the `sentiment_queue` collection, so
+5.sentiment/sent_analysis.py --from_queue only scores the docs that moved.
 """
 #hf_class
 
 from __future__ import annotations
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import argparse
+import hashlib
+import json
 import os
+import queue
+import threading
+import time
+
+from datetime import datetime, timezone
 
 from pymongo.mongo_client import MongoClient
 from pymongo import UpdateOne
@@ -31,6 +56,7 @@ from tqdm import tqdm
 
 import re
 from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
 
 
 # ----------------------------
@@ -45,6 +71,13 @@ DB_NAME_DEFAULT = "ProjectMaster"
 #COLLECTION_NAME_DEFAULT = "Texts"
 COLLECTION_NAME_DEFAULT = "sample_texts"
 BATCH_SIZE = 50
+PREFETCH_PAGES = 2  # pages the reader / writer threads may run ahead of inference
+QUEUE_POLL_SECONDS = 1.0  # reader / writer hand-off: how often a blocked put() checks the other side
+WORKER_POLL_SECONDS = 30  # --workers: how long the parent waits for a message before checking worker liveness
+RUNS_COLLECTION = "runs"  # one summary document per classification run
+RUNS_DIR = "hf_runs"      # local JSON copies of the same summaries
+CHECKPOINTS_COLLECTION = "run_checkpoints"  # resumable progress, one doc per run config
+SENTIMENT_QUEUE_COLLECTION = "sentiment_queue"  # docs whose label changed; drained by sent_analysis.py --from_queue
 
 
 def parse_args():
@@ -60,7 +93,30 @@ def parse_args():
     p.add_argument("--dry_run", action="store_true", help="Compute but do not write updates.")
     p.add_argument("--limit", type=int, default=0, help="Limit relabel docs for testing (0 = no limit).")
     p.add_argument("--hybrid",action="store_true", help="Relabel docs that already have hf_confidence; classify only docs missing hf_confidence.")
-    return p.parse_args()
+    p.add_argument("--infer_batch", type=int, default=8, help="Documents per forward pass (length-sorted buckets).")
+    p.add_argument("--cascade", action="store_true", help="Score with a cheap stage-1 model first; only uncertain docs go to BART.")
+    p.add_argument("--cascade_target", type=float, default=0.95, help="Target agreement of stage-1 decisions with human_label.")
+    p.add_argument("--cascade_train", type=str, default="sample_texts", help="Collection with human_label used to train stage 1.")
+    p.add_argument("--no_cache", action="store_true", help="Bypass the persistent inference cache (hf_cache.sqlite).")
+    p.add_argument("--nli_mode", type=str, default=None, choices=["pair", "binary"], help="pair = both hypotheses (default); binary = PROTEST hypothesis only, calibrated (see calibrate_binary.py).")
+    p.add_argument("--workers", type=int, default=1, help="Classify with N processes, each on its own contiguous _id shard.")
+    p.add_argument("--threads_per_worker", type=int, default=0, help="torch threads per worker (0 = cpu_count // workers).")
+    p.add_argument("--windows", action="store_true", help="Score whole articles with overlapping token windows instead of cutting at --max_chars.")
+    p.add_argument("--window_tokens", type=int, default=400, help="Premise tokens per window (--windows).")
+    p.add_argument("--window_overlap", type=int, default=64, help="Tokens shared by consecutive windows (--windows).")
+    p.add_argument("--window_agg", type=str, default="max", choices=["max", "mean"], help="How window scores combine into hf_confidence (--windows).")
+    p.add_argument("--max_windows", type=int, default=0, help="Cap windows per article (0 = no cap).")
+    p.add_argument("--passages", type=int, default=0, help="Send only the top-K salient paragraphs (+ title) to the model (0 = off).")
+    p.add_argument("--passage_embeddings", action="store_true", help="Add MiniLM similarity to the protest hypothesis to the passage ranking.")
+    p.add_argument("--warmup", action="store_true", help="Load the model and run dummy batches before the first page.")
+    p.add_argument("--paper_thresholds", default=None,
+                   help="JSON map from threshold.py --paper_json; relabels with a per-paper threshold server-side.")
+    p.add_argument("--resume", action="store_true", help="Continue an interrupted run with the same settings from its checkpoint.")
+    p.add_argument("--backend", type=str, default=None, choices=["torch", "onnx", "onnx-int8", "distilled", "biencoder"], help="Inference backend (default: HF_BACKEND env or torch).")
+    args = p.parse_args()
+    if args.windows and not 0 <= args.window_overlap < args.window_tokens:
+        p.error(f"--window_overlap must be in [0, --window_tokens) (got {args.window_overlap} vs {args.window_tokens})")
+    return args
 
 _TOP_RE = re.compile(r"Top='(?P<label>.*?)'\s*\((?P<score>[0-9]*\.?[0-9]+)\)")
 
@@ -86,10 +142,81 @@ def _extract_top_from_reason(reason: str):
         return None, None
     return m.group("label"), _to_float(m.group("score"))
 
-def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=False, limit=0) -> None:
+def _label_change_op(doc_id, new_label: str, prev_label: Optional[str], source: str) -> UpdateOne:
+    """Queue entry for the sentiment worker; the latest change for a doc wins."""
+    return UpdateOne(
+        {"_id": doc_id},
+        {"$set": {"label": new_label, "prev_label": prev_label, "source": source, "queued_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+def _label_change_ops(docs: List[Dict[str, Any]], labels: Dict[Any, str], source: str) -> List[UpdateOne]:
+    """Queue ops for docs whose new label (labels[_id]) differs from their stored hf_label_name."""
+    return [
+        _label_change_op(d["_id"], labels[d["_id"]], d.get("hf_label_name"), source)
+        for d in docs
+        if d["_id"] in labels and labels[d["_id"]] != d.get("hf_label_name")
+    ]
+
+def _config_hash(config: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+class RunCheckpoint:
+    """
+    Persisted progress of a run, one document per run configuration in the
+    run_checkpoints collection: last written _id and counters per phase
+    ("relabel", "classify"). With resume=True an unfinished checkpoint for the
+    same config hash is picked up; otherwise a fresh one is started.
+    """
+
+    def __init__(self, db, config: Dict[str, Any], *, resume: bool):
+        self.col = db[CHECKPOINTS_COLLECTION]
+        self.key = _config_hash(config)
+        doc = self.col.find_one({"_id": self.key}) if resume else None
+        if doc and doc.get("status") == "running":
+            self.state = doc
+            phases = ", ".join(f"{k}: last_id={v.get('last_id')!r}" for k, v in doc.get("phases", {}).items())
+            print(f"[checkpoint] resuming {self.key} ({phases or 'no progress yet'})")
+        else:
+            if resume:
+                print(f"[checkpoint] no unfinished run for config {self.key}; starting from the beginning")
+            self.state = {
+                "_id": self.key,
+                "config": config,
+                "status": "running",
+                "phases": {},
+                "started_at": datetime.now(timezone.utc),
+            }
+            self.col.replace_one({"_id": self.key}, self.state, upsert=True)
+
+    def phase(self, name: str) -> Dict[str, Any]:
+        return self.state.get("phases", {}).get(name, {})
+
+    def save(self, name: str, last_id, **counters) -> None:
+        entry = {"last_id": last_id, **counters, "updated_at": datetime.now(timezone.utc)}
+        self.state.setdefault("phases", {})[name] = entry
+        try:
+            self.col.update_one({"_id": self.key}, {"$set": {f"phases.{name}": entry}})
+        except PyMongoError as e:
+            print(f"[checkpoint] save failed ({e}); continuing")
+
+    def finish(self) -> None:
+        self.col.update_one(
+            {"_id": self.key},
+            {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}},
+        )
+
+def _progress_bar(total: int, desc: str) -> tqdm:
+    """tqdm bar; its ETA comes from the measured rate, docs/sec is shown next to it."""
+    return tqdm(total=total, desc=desc, unit="doc", dynamic_ncols=True)
+
+def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=False, limit=0, checkpoint: Optional[RunCheckpoint] = None) -> None:
     """
-    Recompute hf_label, hf_label_name, hf_reason for ALL docs with hf_confidence.
+    Recompute hf_label, hf_label_name, hf_reason for ALL docs with hf_confidence
+    (cascade cheap-stage docs have none and keep their label).
     Atlas-safe: does NOT use no_cursor_timeout; paginates by _id in chunks.
+    With a checkpoint, progress is saved after every page and a resumed run
+    continues after the last written _id.
     """
     # Debug: if user provided a specific _id, just do that one (fast + avoids long runs)
     if debug_id:
@@ -98,6 +225,7 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
             {"_id": 1, "hf_confidence": 1, "hf_label": 1, "hf_label_name": 1, "hf_reason": 1},
         )
         print("\n[debug] BEFORE:", before)
+        prev_label = (before or {}).get("hf_label_name")
 
         conf = _to_float((before or {}).get("hf_confidence"))
         if conf is None:
@@ -113,16 +241,18 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
         if top_label is not None and top_score is not None:
             new_reason = (
                 f"Top='{top_label}' ({top_score:.3f}); "
-                f"P(PROTEST)={conf:.3f}; threshold={threshold:.2f} -> {label_name}"
+                f"P(PROTEST)={conf:.3f}; threshold={threshold:.4f} -> {label_name}"
             )
         else:
-            new_reason = f"P(PROTEST)={conf:.3f}; threshold={threshold:.2f} -> {label_name}"
+            new_reason = f"P(PROTEST)={conf:.3f}; threshold={threshold:.4f} -> {label_name}"
 
         if not dry_run:
             col.update_one(
                 {"_id": debug_id},
                 {"$set": {"hf_label": label_int, "hf_label_name": label_name, "hf_reason": new_reason}},
             )
+            if label_name != prev_label:
+                _flush(col.database[SENTIMENT_QUEUE_COLLECTION], [_label_change_op(debug_id, label_name, prev_label, "relabel")])
 
         after = col.find_one(
             {"_id": debug_id},
@@ -132,7 +262,9 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
         return
 
     base_query = {"hf_confidence": {"$exists": True, "$ne": None}}
-    projection = {"_id": 1, "hf_confidence": 1, "hf_reason": 1}
+    projection = {"_id": 1, "hf_confidence": 1, "hf_reason": 1, "hf_label_name": 1}
+    queue_col = col.database[SENTIMENT_QUEUE_COLLECTION]
+    queue_failed = False
 
     READ_BATCH = 1000  # how many docs to read per chunk (safe on Atlas)
     last_id = None
@@ -140,7 +272,24 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
     scanned = 0
     convertible = 0
 
+    if checkpoint is not None:
+        state = checkpoint.phase("relabel")
+        last_id = state.get("last_id")
+        scanned = int(state.get("scanned", 0))
+        convertible = int(state.get("convertible", 0))
+
+    remaining_q = dict(base_query)
+    if last_id is not None:
+        remaining_q["_id"] = {"$gt": last_id}
+    total = col.count_documents(remaining_q)
+    if limit:
+        total = min(total, max(limit - scanned, 0))
+    bar = _progress_bar(total, "relabel")
+    t_start = time.perf_counter()
+
     while True:
+        if limit and scanned >= limit:
+            break
         q = dict(base_query)
         if last_id is not None:
             q["_id"] = {"$gt": last_id}
@@ -154,13 +303,13 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
             break
 
         ops: List[UpdateOne] = []
+        queue_ops: List[UpdateOne] = []
 
         for doc in batch:
-            scanned += 1
-            last_id = doc["_id"]
-
-            if limit and scanned > limit:
+            if limit and scanned >= limit:
                 break
+            scanned += 1
+            last_id = doc["_id"]  # only docs actually processed may reach the checkpoint
 
             conf = _to_float(doc.get("hf_confidence"))
             if conf is None:
@@ -177,10 +326,10 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
             if top_label is not None and top_score is not None:
                 new_reason = (
                     f"Top='{top_label}' ({top_score:.3f}); "
-                    f"P(PROTEST)={conf:.3f}; threshold={threshold:.2f} -> {label_name}"
+                    f"P(PROTEST)={conf:.3f}; threshold={threshold:.4f} -> {label_name}"
                 )
             else:
-                new_reason = f"P(PROTEST)={conf:.3f}; threshold={threshold:.2f} -> {label_name}"
+                new_reason = f"P(PROTEST)={conf:.3f}; threshold={threshold:.4f} -> {label_name}"
 
             ops.append(
                 UpdateOne(
@@ -188,6 +337,8 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
                     {"$set": {"hf_label": label_int, "hf_label_name": label_name, "hf_reason": new_reason}},
                 )
             )
+            if label_name != doc.get("hf_label_name"):
+                queue_ops.append(_label_change_op(doc["_id"], label_name, doc.get("hf_label_name"), "relabel"))
 
             if len(ops) >= BATCH_SIZE:
                 if not dry_run:
@@ -198,31 +349,346 @@ def relabel_from_confidence(col, threshold: float, *, debug_id=None, dry_run=Fal
         if ops and not dry_run:
             res = col.bulk_write(ops, ordered=False)
             print(f"[relabel] batch modified={res.modified_count}")
+        if not dry_run and not _flush(queue_col, queue_ops, tag="sentiment_queue") and not queue_failed:
+            queue_failed = True
+            print(f"[checkpoint] sentiment queue write failed in the page ending at {last_id!r}; "
+                  "checkpoint kept before it (rerun with --resume to retry)")
+
+        if checkpoint is not None and not dry_run and not queue_failed:
+            checkpoint.save("relabel", last_id, scanned=scanned, convertible=convertible)
+
+        bar.update(min(len(batch), bar.total - bar.n) if bar.total else len(batch))
+        elapsed = time.perf_counter() - t_start
+        if elapsed:
+            bar.set_postfix(docs_per_sec=f"{bar.n / elapsed:.0f}")
 
         if limit and scanned >= limit:
             break
 
+    bar.close()
     print(f"[relabel] scanned={scanned}  convertible_confidence={convertible}  dry_run={dry_run}")
 
-def _flush(col, ops: List[UpdateOne], *, tag: str = "bulk") -> None:
-    """Write a batch of UpdateOne ops safely."""
-    if not ops:
+# ----------------------------
+# Per-paper thresholds (applied server-side)
+# ----------------------------
+def load_paper_thresholds(path: str) -> Tuple[Optional[float], Dict[str, float]]:
+    """Read the map written by threshold.py --paper_json: {"default": t, "papers": {paper: t}}."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    default = data.get("default")
+    return (float(default) if default is not None else None), {str(k): float(v) for k, v in data.get("papers", {}).items()}
+
+def _fixed_expr(x: Any, decimals: int) -> Dict[str, Any]:
+    """Aggregation equivalent of f"{x:.{decimals}f}" for values in [0, 1]."""
+    s = {"$toString": {"$round": [x, decimals]}}
+    return {"$let": {
+        "vars": {"parts": {"$split": [s, "."]}},
+        "in": {"$concat": [
+            {"$arrayElemAt": ["$$parts", 0]},
+            ".",
+            {"$substrCP": [{"$concat": [{"$ifNull": [{"$arrayElemAt": ["$$parts", 1]}, ""]}, "0" * decimals]}, 0, decimals]},
+        ]},
+    }}
+
+def _paper_threshold_expr(thresholds: Dict[str, float], default: float) -> Dict[str, Any]:
+    return {"$switch": {
+        "branches": [{"case": {"$eq": ["$paper", paper]}, "then": t} for paper, t in thresholds.items()],
+        "default": default,
+    }}
+
+def queue_paper_label_changes(col, query: Dict[str, Any], thresholds: Dict[str, float], default: float) -> None:
+    """
+    Before a per-paper relabel: $merge the docs whose label is about to change
+    into the sentiment queue (server-side, nothing is read into Python).
+    """
+    new_label = {"$cond": [{"$gte": ["$hf_confidence", _paper_threshold_expr(thresholds, default)]}, "PROTEST", "NOT PROTEST"]}
+    col.aggregate([
+        {"$match": query},
+        {"$project": {"label": new_label, "prev_label": {"$ifNull": ["$hf_label_name", None]}}},
+        {"$match": {"$expr": {"$ne": ["$label", "$prev_label"]}}},
+        {"$set": {"source": {"$literal": "relabel_per_paper"}, "queued_at": "$$NOW"}},
+        {"$merge": {"into": SENTIMENT_QUEUE_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ], allowDiskUse=True)
+
+def relabel_pipeline(thresholds: Dict[str, float], default: float) -> List[Dict[str, Any]]:
+    """
+    Update pipeline that sets hf_label / hf_label_name / hf_reason from
+    hf_confidence with the threshold of the doc's paper ($switch, default for
+    unlisted papers). hf_reason keeps the relabel format, including the
+    Top='...' part of the previous reason when present.
+    """
+    top = {"$regexFind": {"input": {"$ifNull": ["$hf_reason", ""]}, "regex": r"Top='(.*?)'\s*\(([0-9]*\.?[0-9]+)\)"}}
+    return [
+        {"$set": {"_thr": _paper_threshold_expr(thresholds, default), "_top": top}},
+        {"$set": {"_protest": {"$gte": ["$hf_confidence", "$_thr"]}}},
+        {"$set": {
+            "hf_label": {"$cond": ["$_protest", 1, 0]},
+            "hf_label_name": {"$cond": ["$_protest", "PROTEST", "NOT PROTEST"]},
+            "hf_reason": {"$concat": [
+                {"$cond": [
+                    {"$eq": ["$_top", None]},
+                    "",
+                    {"$concat": [
+                        "Top='", {"$arrayElemAt": ["$_top.captures", 0]}, "' (",
+                        _fixed_expr({"$toDouble": {"$arrayElemAt": ["$_top.captures", 1]}}, 3), "); ",
+                    ]},
+                ]},
+                "P(PROTEST)=", _fixed_expr("$hf_confidence", 3),
+                "; threshold=", _fixed_expr("$_thr", 4),
+                " -> ", {"$cond": ["$_protest", "PROTEST", "NOT PROTEST"]},
+            ]},
+        }},
+        {"$unset": ["_thr", "_top", "_protest"]},
+    ]
+
+def relabel_per_paper(col, thresholds: Dict[str, float], default: float, *, debug_id=None, dry_run=False) -> None:
+    """
+    Relabel every doc with numeric hf_confidence using per-paper thresholds in
+    ONE server-side update_many (no documents are read into Python).
+    dry_run reports the resulting PROTEST counts per paper instead.
+    Cascade cheap-stage docs have no hf_confidence and keep their label.
+    """
+    query: Dict[str, Any] = {"hf_confidence": {"$type": "number"}}
+    if debug_id:
+        query["_id"] = debug_id
+    print(f"[relabel] per-paper thresholds (default={default:.4f}): "
+          + ", ".join(f"{p}={t:.4f}" for p, t in sorted(thresholds.items())))
+    n_cheap = col.count_documents({"hf_stage": "cheap"}) if not debug_id else 0
+    if n_cheap:
+        print(f"[relabel] {n_cheap} cascade cheap-stage docs keep their label (no hf_confidence)")
+
+    pipeline = relabel_pipeline(thresholds, default)
+    if dry_run:
+        rows = col.aggregate([
+            {"$match": query},
+            pipeline[0],
+            {"$group": {
+                "_id": "$paper",
+                "threshold": {"$first": "$_thr"},
+                "n": {"$sum": 1},
+                "protest": {"$sum": {"$cond": [{"$gte": ["$hf_confidence", "$_thr"]}, 1, 0]}},
+            }},
+            {"$sort": {"_id": 1}},
+        ], allowDiskUse=True)
+        for r in rows:
+            print(f"[relabel][dry_run] {r['_id']}: t={r['threshold']:.4f} protest={r['protest']}/{r['n']}")
         return
+
+    t0 = time.perf_counter()
+    queue_paper_label_changes(col, query, thresholds, default)
+    res = col.update_many(query, pipeline)
+    print(f"[relabel] matched={res.matched_count} modified={res.modified_count} in {time.perf_counter() - t0:.1f}s")
+    if debug_id:
+        print("[debug] AFTER:", col.find_one({"_id": debug_id}, {"paper": 1, "hf_confidence": 1, "hf_label_name": 1, "hf_reason": 1}))
+
+def _flush(col, ops: List[UpdateOne], *, tag: str = "bulk") -> bool:
+    """Write a batch of UpdateOne ops safely. Returns False if the write failed."""
+    if not ops:
+        return True
     try:
         res = col.bulk_write(ops, ordered=False)
         # print only when something actually changed (avoids spam)
         if res.modified_count:
             print(f"[{tag}] modified={res.modified_count} matched={res.matched_count}")
+        return True
     except PyMongoError as e:
         print(f"[Mongo] bulk_write error: {e}")
+        return False
 
-def classify_missing_confidence(col, args) -> None:
+def _classification_ops(docs: List[Dict[str, Any]], results, args, extra: Optional[Dict[Any, Dict[str, Any]]] = None,
+                        labels_out: Optional[Dict[Any, str]] = None) -> List[UpdateOne]:
     """
-    Classify ONLY documents that don't have hf_confidence yet (newly scraped).
-    Atlas-safe pagination by _id.
+    Build one UpdateOne per doc from classifier results (result may be an Exception).
+    `extra` maps _id -> additional fields to $set on that doc; `labels_out`
+    (if given) receives _id -> hf_label_name for every labelled doc.
     """
-    from hf_class import classify_article_with_hf
+    extra = extra or {}
+    ops: List[UpdateOne] = []
+    for doc, res in zip(docs, results):
+        doc_id = doc["_id"]
+        if isinstance(res, Exception):
+            ops.append(
+                UpdateOne(
+                    {"_id": doc_id},
+                    {"$set": {"hf_status": "error", "hf_error_message": str(res), **extra.get(doc_id, {})}},
+                )
+            )
+        elif res is None:
+            ops.append(
+                UpdateOne(
+                    {"_id": doc_id},
+                    {
+                        "$set": {
+                            "hf_status": "skipped_short_text",
+                            "hf_reason": f"Skipped: text shorter than min_length={args.min_length}",
+                            **extra.get(doc_id, {}),
+                        }
+                    },
+                )
+            )
+        else:
+            # store full classification output
+            payload = {
+                "hf_confidence": res["confidence"],
+                "hf_label": res["label"],
+                "hf_label_name": res["label_name"],
+                "hf_model": res["model"],
+                "hf_reason": res["reason"],
+                "hf_status": "ok",
+            }
+            # optional if your classifier returns it
+            if "top_label" in res:
+                payload["hf_top_label"] = res["top_label"]
+            if "top_score" in res:
+                payload["hf_top_score"] = res["top_score"]
+            if "embedding" in res:
+                from biencoder import EMBEDDING_FIELD, EMBEDDING_MODEL_NAME
+                payload[EMBEDDING_FIELD] = res["embedding"]
+                payload["emb_model"] = EMBEDDING_MODEL_NAME
+            if "n_windows" in res:
+                payload["hf_windows"] = res["n_windows"]
+                payload["hf_tokens"] = res["tokens"]
+            payload.update(extra.get(doc_id, {}))
+            if labels_out is not None:
+                labels_out[doc_id] = res["label_name"]
+
+            ops.append(UpdateOne({"_id": doc_id}, {"$set": payload}))
+    return ops
+
+def _classify_docs(docs: List[Dict[str, Any]], args, stats: Dict[str, Any]) -> list:
+    """
+    Run the classifier over docs (after --passages reduction, if enabled) and
+    count agreement with human_label where the docs have one.
+    """
+    articles = [(doc.get("title") or "", doc.get("text") or "") for doc in docs]
+    if args.passages:
+        from passages import select_passages_batch
+        reduced = select_passages_batch(articles, k=args.passages, use_embeddings=args.passage_embeddings)
+        stats["passage_chars_in"] = stats.get("passage_chars_in", 0) + sum(min(len(t), args.max_chars) for _, t in articles)
+        # never let the reduction push a doc under min_length (it would be skipped)
+        articles = [
+            (title, short if len(short.strip()) >= args.min_length else text)
+            for (title, text), short in zip(articles, reduced)
+        ]
+        stats["passage_chars_out"] = stats.get("passage_chars_out", 0) + sum(min(len(t), args.max_chars) for _, t in articles)
+
+    results = _run_classifier(articles, args, stats)
+    _update_eval(docs, results, stats)
+    return results
+
+def _update_eval(docs: List[Dict[str, Any]], results, stats: Dict[str, Any]) -> None:
+    """Count TP/FP/TN/FN in stats for docs that carry a human_label (e.g. sample_texts)."""
+    for doc, res in zip(docs, results):
+        if not isinstance(res, dict) or doc.get("human_label") is None:
+            continue
+        y_true, y_pred = int(doc["human_label"]), int(res["label"])
+        key = {(1, 1): "eval_tp", (0, 1): "eval_fp", (0, 0): "eval_tn", (1, 0): "eval_fn"}[(y_true, y_pred)]
+        stats[key] = stats.get(key, 0) + 1
+
+def _run_classifier(articles: List[Tuple[str, str]], args, stats: Dict[str, Any]) -> list:
+    """
+    Batched (or windowed) classification. If the batch fails as a whole,
+    retry one doc at a time so a single bad doc only marks itself as error.
+    """
+    from hf_class import classify_articles_with_hf, classify_article_with_hf, classify_articles_windowed
+
+    if args.windows:
+        try:
+            return classify_articles_windowed(
+                articles,
+                protest_threshold=args.threshold,
+                min_length=args.min_length,
+                window_tokens=args.window_tokens,
+                overlap=args.window_overlap,
+                aggregate=args.window_agg,
+                max_windows=args.max_windows,
+                batch_size=args.infer_batch,
+                stats=stats,
+                use_cache=not args.no_cache,
+            )
+        except Exception as e:
+            return [e] * len(articles)
+
+    try:
+        return classify_articles_with_hf(
+            articles,
+            protest_threshold=args.threshold,
+            min_length=args.min_length,
+            max_chars=args.max_chars,
+            batch_size=args.infer_batch,
+            stats=stats,
+            use_cache=not args.no_cache,
+        )
+    except Exception as e:
+        print(f"[classify_missing] batch failed ({e}); retrying one doc at a time")
+
+    results = []
+    for title, text in articles:
+        try:
+            results.append(
+                classify_article_with_hf(
+                    title,
+                    text,
+                    protest_threshold=args.threshold,
+                    min_length=args.min_length,
+                    max_chars=args.max_chars,
+                )
+            )
+        except Exception as e:
+            results.append(e)
+    return results
 
+def _cascade_ops(docs: List[Dict[str, Any]], cascade, args, stats: Dict[str, Any],
+                 labels_out: Optional[Dict[Any, str]] = None) -> List[UpdateOne]:
+    """
+    Two-stage classification of one page: the cheap model decides docs outside
+    its uncertainty band, the rest go to BART. Every scored doc records hf_stage.
+    Cheap decisions $unset hf_confidence and the other BART-only fields: it is
+    P(PROTEST) from BART only, so a stale BART score (--force) can't later
+    overwrite the cascade label via relabel_from_confidence /
+    relabel_per_paper. Their stage-1 score is in hf_cheap_score; downstream
+    tools recognise them by hf_stage == "cheap".
+    """
+    scorable = [d for d in docs if len((d.get("text") or "").strip()) >= args.min_length]
+    to_bart = [d for d in docs if len((d.get("text") or "").strip()) < args.min_length]
+
+    ops: List[UpdateOne] = []
+    cheap_scores = cascade.score(scorable) if scorable else []
+    bart_extra: Dict[Any, Dict[str, Any]] = {}
+    for doc, score in zip(scorable, cheap_scores):
+        score = float(score)
+        decision = cascade.decide(score)
+        if decision is None:
+            to_bart.append(doc)
+            bart_extra[doc["_id"]] = {"hf_stage": "bart", "hf_cheap_score": score}
+            continue
+        label_name = "PROTEST" if decision == 1 else "NOT PROTEST"
+        if labels_out is not None:
+            labels_out[doc["_id"]] = label_name
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "hf_label": decision,
+            "hf_label_name": label_name,
+            "hf_model": cascade.model_name,
+            "hf_reason": cascade.reason(score, label_name),
+            "hf_status": "ok",
+            "hf_stage": "cheap",
+            "hf_cheap_score": score,
+        }, "$unset": {"hf_confidence": "", "hf_top_label": "", "hf_top_score": "", "hf_windows": "", "hf_tokens": ""}}))
+
+    stats["cascade_cheap"] = stats.get("cascade_cheap", 0) + len(ops)
+    stats["cascade_bart"] = stats.get("cascade_bart", 0) + len(to_bart)
+
+    if to_bart:
+        ops.extend(_classification_ops(to_bart, _classify_docs(to_bart, args, stats), args, extra=bart_extra,
+                                       labels_out=labels_out))
+    return ops
+
+def _missing_query(args, cascade=None) -> Dict[str, Any]:
+    """
+    Query for the docs classify_missing_confidence still has to score. Docs
+    already decided by the cascade's cheap stage count as scored with or
+    without --cascade (only --force reclassifies them).
+    """
     base_query: Dict[str, Any] = {"text": {"$exists": True, "$ne": None, "$ne": ""}}
 
     if not args.force:
@@ -231,100 +697,480 @@ def classify_missing_confidence(col, args) -> None:
             {"hf_confidence": {"$exists": False}},
             {"hf_confidence": None},
         ]
+        base_query["hf_stage"] = {"$ne": "cheap"}
+    return base_query
+
+def _configure_classifier(args) -> None:
+    """Apply --backend / --nli_mode to hf_class (per process)."""
+    if args.backend:
+        from hf_class import set_backend
+        set_backend(args.backend)
+    if args.nli_mode:
+        from hf_class import set_nli_mode
+        set_nli_mode(args.nli_mode)
+    if args.warmup:
+        from hf_class import warmup
+        warmup()
+
+def _offer(q: "queue.Queue", item, alive) -> bool:
+    """put() on a bounded queue that gives up (returns False) once alive() is False."""
+    while True:
+        try:
+            q.put(item, timeout=QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            if not alive():
+                return False
 
-    projection = {"_id": 1, "title": 1, "text": 1, "hf_confidence": 1, "hf_status": 1}
-    READ_BATCH = 250
-    last_id = None
+def _page_reader(col, base_query, projection, read_batch: int, id_range, limit: int, out: "queue.Queue", timings: Dict[str, float], start_after=None, stop: Optional[threading.Event] = None) -> None:
+    """
+    Reader stage: paginate by _id and put pages on `out` (bounded, so it stays
+    PREFETCH_PAGES ahead of inference). Ends with None; errors are forwarded.
+    Time spent in Mongo reads is added to timings["read_seconds"].
+    start_after: resume after this _id (from a checkpoint).
+    stop: set by the consumer when it gives up, so a blocked put() returns.
+    """
+    stop = stop or threading.Event()
 
+    def alive() -> bool:
+        return not stop.is_set()
+
+    last_id = start_after
     scanned = 0
-    attempted = 0
+    try:
+        while True:
+            q = dict(base_query)
+            id_cond: Dict[str, Any] = {}
+            if id_range is not None:
+                id_cond["$gte"] = id_range[0]
+                if id_range[1] is not None:
+                    id_cond["$lt"] = id_range[1]
+            if last_id is not None:
+                id_cond["$gt"] = last_id
+            if id_cond:
+                q["_id"] = id_cond
+
+            t0 = time.perf_counter()
+            batch = list(col.find(q, projection).sort("_id", 1).limit(read_batch))
+            timings["read_seconds"] = timings.get("read_seconds", 0.0) + time.perf_counter() - t0
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
 
-    while True:
-        q = dict(base_query)
-        if last_id is not None:
-            q["_id"] = {"$gt": last_id}
+            if limit:
+                batch = batch[: max(limit - scanned, 0)]
+            scanned += len(batch)
+            if batch and not _offer(out, batch, alive):
+                return
 
-        batch = list(col.find(q, projection).sort("_id", 1).limit(READ_BATCH))
-        if not batch:
+            if limit and scanned >= limit:
+                break
+    except Exception as e:
+        if not _offer(out, e, alive):
+            return
+    _offer(out, None, alive)
+
+def _page_writer(col, ops_queue: "queue.Queue", dry_run: bool, tag: str, timings: Dict[str, float], checkpoint: Optional[RunCheckpoint] = None, errors: Optional[List[BaseException]] = None) -> None:
+    """
+    Writer stage: bulk_write each page of ops in BATCH_SIZE chunks until None.
+    Items are (ops, queue_ops, last_id, scanned_so_far); label changes go to
+    the sentiment queue after the labels themselves are written, and the
+    checkpoint only advances while every write so far has succeeded: after
+    the first failed flush it stays before that page, so --resume retries it.
+    Time spent in Mongo writes is added to timings["write_seconds"]. An
+    unexpected exception ends the thread and is appended to `errors` for the
+    producer to re-raise.
+    """
+    try:
+        _write_pages(col, ops_queue, dry_run, tag, timings, checkpoint)
+    except Exception as e:
+        if errors is not None:
+            errors.append(e)
+        print(f"[{tag}] writer stopped: {e!r}")
+
+def _write_pages(col, ops_queue: "queue.Queue", dry_run: bool, tag: str, timings: Dict[str, float], checkpoint: Optional[RunCheckpoint]) -> None:
+    frozen = False
+    while True:
+        item = ops_queue.get()
+        if item is None:
             break
+        ops, queue_ops, last_id, scanned = item
+        if dry_run:
+            continue
+        t0 = time.perf_counter()
+        ok = all([_flush(col, ops[i:i + BATCH_SIZE], tag=tag) for i in range(0, len(ops), BATCH_SIZE)])
+        ok = _flush(col.database[SENTIMENT_QUEUE_COLLECTION], queue_ops, tag="sentiment_queue") and ok
+        timings["write_seconds"] = timings.get("write_seconds", 0.0) + time.perf_counter() - t0
+        if checkpoint is None:
+            continue
+        if not ok and not frozen:
+            frozen = True
+            print(f"[checkpoint] write failed in the page ending at {last_id!r}; checkpoint kept before it "
+                  "(rerun with --resume to retry)")
+        if not frozen:
+            checkpoint.save("classify", last_id, scanned=scanned)
+
+def classify_missing_confidence(col, args, cascade=None, *, id_range=None, progress=None, tag="classify_missing", checkpoint: Optional[RunCheckpoint] = None) -> Dict[str, Any]:
+    """
+    Classify ONLY documents that don't have hf_confidence yet (newly scraped).
+    Atlas-safe pagination by _id; each page is classified in length-sorted batches.
+    Reading the next page and writing the previous one run in background
+    threads, so Atlas latency overlaps with inference.
+    With a cascade (see cascade.py) the cheap model decides first and docs it
+    already decided are not picked up again.
+
+    id_range=(lo, hi) restricts the run to lo <= _id < hi (hi=None: no upper
+    bound); used by the --workers shards. progress(n_docs) is called after
+    every page; without it a tqdm bar with ETA is shown. With a checkpoint
+    the run resumes after the last written _id and saves after every page.
+    Returns the run stats (docs, seconds, cache hits, ...).
+    """
+    base_query = _missing_query(args, cascade)
 
-        ops: List[UpdateOne] = []
+    projection = {"_id": 1, "title": 1, "text": 1, "hf_confidence": 1, "hf_status": 1, "human_label": 1, "hf_label_name": 1}
+    READ_BATCH = 250
 
-        for doc in batch:
-            scanned += 1
-            last_id = doc["_id"]
+    scanned = 0
+    attempted = 0
+    stats: Dict[str, Any] = {}
+
+    start_after = None
+    if checkpoint is not None:
+        state = checkpoint.phase("classify")
+        start_after = state.get("last_id")
+        scanned = attempted = int(state.get("scanned", 0))
+
+    bar = None
+    if progress is None:
+        remaining_q = dict(base_query)
+        if start_after is not None:
+            remaining_q["_id"] = {"$gt": start_after}
+        total = col.count_documents(remaining_q)
+        if args.limit:
+            total = min(total, max(args.limit - scanned, 0))
+        bar = _progress_bar(total, tag)
+
+    # Three stages overlap: the reader thread keeps the next page(s) ready,
+    # this thread runs inference, the writer thread does bulk_write.
+    pages: "queue.Queue" = queue.Queue(maxsize=PREFETCH_PAGES)
+    writes: "queue.Queue" = queue.Queue(maxsize=PREFETCH_PAGES)
+    read_timings: Dict[str, float] = {}
+    write_timings: Dict[str, float] = {}
+    write_errors: List[BaseException] = []
+    stop_reading = threading.Event()
+    reader = threading.Thread(
+        target=_page_reader,
+        args=(col, base_query, projection, READ_BATCH, id_range, max(args.limit - scanned, 0) if args.limit else 0,
+              pages, read_timings, start_after, stop_reading),
+        daemon=True,
+    )
+    writer = threading.Thread(
+        target=_page_writer, args=(col, writes, args.dry_run, tag, write_timings, checkpoint, write_errors), daemon=True
+    )
 
-            if args.limit and scanned > args.limit:
+    t_start = time.perf_counter()
+    infer_seconds = 0.0
+    reader.start()
+    writer.start()
+    try:
+        while True:
+            batch = pages.get()
+            if batch is None:
                 break
+            if isinstance(batch, Exception):
+                raise batch
 
-            doc_id = doc["_id"]
-            title = doc.get("title") or ""
-            text = doc.get("text") or ""
+            scanned += len(batch)
+            attempted += len(batch)
 
-            try:
-                attempted += 1
-                res = classify_article_with_hf(
-                    title,
-                    text,
-                    protest_threshold=args.threshold,
-                    min_length=args.min_length,
-                    max_chars=args.max_chars,
-                )
-            except Exception as e:
-                ops.append(
-                    UpdateOne(
-                        {"_id": doc_id},
-                        {"$set": {"hf_status": "error", "hf_error_message": str(e)}},
-                    )
-                )
+            labels: Dict[Any, str] = {}
+            t0 = time.perf_counter()
+            if cascade is not None:
+                ops = _cascade_ops(batch, cascade, args, stats, labels_out=labels)
             else:
-                if res is None:
-                    ops.append(
-                        UpdateOne(
-                            {"_id": doc_id},
-                            {
-                                "$set": {
-                                    "hf_status": "skipped_short_text",
-                                    "hf_reason": f"Skipped: text shorter than min_length={args.min_length}",
-                                }
-                            },
-                        )
-                    )
-                else:
-                    # store full classification output
-                    payload = {
-                        "hf_confidence": res["confidence"],
-                        "hf_label": res["label"],
-                        "hf_label_name": res["label_name"],
-                        "hf_model": res["model"],
-                        "hf_reason": res["reason"],
-                        "hf_status": "ok",
-                    }
-                    # optional if your classifier returns it
-                    if "top_label" in res:
-                        payload["hf_top_label"] = res["top_label"]
-                    if "top_score" in res:
-                        payload["hf_top_score"] = res["top_score"]
-
-                    ops.append(UpdateOne({"_id": doc_id}, {"$set": payload}))
+                ops = _classification_ops(batch, _classify_docs(batch, args, stats), args, labels_out=labels)
+            infer_seconds += time.perf_counter() - t0
 
-            if len(ops) >= BATCH_SIZE:
-                if not args.dry_run:
-                    #_flush(col, ops)
-                    _flush(col, ops, tag="classify_missing")
-                ops = []
-
-        if ops and not args.dry_run:
-            #_flush(col, ops)
-            _flush(col, ops, tag="classify_missing")
+            if not _offer(writes, (ops, _label_change_ops(batch, labels, "classify"), batch[-1]["_id"], scanned),
+                          writer.is_alive):
+                break  # writer died; its error is raised below
 
-        if args.limit and scanned >= args.limit:
-            break
+            if progress is not None:
+                progress(len(batch))
+            else:
+                bar.update(len(batch))
+                elapsed = time.perf_counter() - t_start
+                bar.set_postfix(docs_per_sec=f"{bar.n / elapsed:.2f}" if elapsed else "-")
+    finally:
+        stop_reading.set()  # unblocks the reader if inference raised
+        _offer(writes, None, writer.is_alive)
+        writer.join()
+        if bar is not None:
+            bar.close()
+    if write_errors:
+        raise write_errors[0]
+    wall = time.perf_counter() - t_start
+    stats["wall_seconds"] = wall
+    stats["infer_seconds"] = infer_seconds
+    stats["read_seconds"] = read_timings.get("read_seconds", 0.0)
+    stats["write_seconds"] = write_timings.get("write_seconds", 0.0)
+
+    stats["scanned"] = scanned
+    docs_per_sec = stats.get("docs", 0) / stats["seconds"] if stats.get("seconds") else 0.0
+    print(
+        f"[{tag}] scanned={scanned} attempted_inference={attempted} "
+        f"docs_per_sec={docs_per_sec:.2f} dry_run={args.dry_run} force={args.force}"
+    )
+    if stats.get("passage_chars_in"):
+        print(
+            f"[{tag}] passages: top-{args.passages} kept {stats['passage_chars_out'] / stats['passage_chars_in']:.1%} "
+            f"of model input chars"
+        )
+    if any(k in stats for k in ("eval_tp", "eval_fp", "eval_tn", "eval_fn")):
+        from metrics import fbeta, safe_div
+        tp, fp, tn, fn = (int(stats.get(k, 0)) for k in ("eval_tp", "eval_fp", "eval_tn", "eval_fn"))
+        precision, recall = safe_div(tp, tp + fp), safe_div(tp, tp + fn)
+        print(
+            f"[{tag}] vs human_label: TP={tp} FP={fp} TN={tn} FN={fn} "
+            f"P={precision:.3f} R={recall:.3f} F0.5={fbeta(precision, recall, 0.5):.3f}"
+        )
+    if stats.get("windows"):
+        print(
+            f"[{tag}] windows={int(stats['windows'])} tokens={int(stats['tokens'])} "
+            f"tokens_per_doc={stats['tokens'] / max(stats.get('docs', 0), 1):.0f}"
+        )
+    if wall:
+        print(
+            f"[{tag}] wall={wall:.1f}s mongo_read={stats['read_seconds']:.1f}s inference={infer_seconds:.1f}s "
+            f"mongo_write={stats['write_seconds']:.1f}s model_utilization={infer_seconds / wall:.1%}"
+        )
+    hits, misses = int(stats.get("cache_hits", 0)), int(stats.get("cache_misses", 0))
+    if hits + misses:
+        print(f"[cache] hits={hits} misses={misses} hit_rate={hits / (hits + misses):.2%}")
+    if cascade is not None:
+        n_cheap = int(stats.get("cascade_cheap", 0))
+        n_bart = int(stats.get("cascade_bart", 0))
+        share = n_cheap / (n_cheap + n_bart) if (n_cheap + n_bart) else 0.0
+        print(f"[cascade] decided_by_cheap={n_cheap} sent_to_bart={n_bart} cheap_share={share:.2%}")
+    return stats
+
+def _shard_bounds(col, query: Dict[str, Any], n_shards: int, limit: int = 0) -> List[Tuple[Any, Any, int]]:
+    """
+    Split the _id space of `query` into n contiguous shards of ~equal size.
+    Returns (lo, hi, n_docs) per shard; hi=None means "no upper bound".
+    """
+    cursor = col.find(query, {"_id": 1}).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    ids = [d["_id"] for d in cursor]
+    if not ids:
+        return []
+    n_shards = max(1, min(n_shards, len(ids)))
+    size = -(-len(ids) // n_shards)
+    shards = []
+    for start in range(0, len(ids), size):
+        end = start + size
+        hi = ids[end] if end < len(ids) else None
+        shards.append((ids[start], hi, len(ids[start:end])))
+    return shards
+
+def _shard_worker(shard_idx: int, id_range, args, cascade, threads: int, queue) -> None:
+    """One --workers process: pinned thread budget, own Mongo connection."""
+    # Pin before torch is imported (hf_class is imported lazily below).
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    _configure_classifier(args)
+    client = MongoClient(MONGO_URI)
+    col = client[args.db][args.collection]
+    try:
+        stats = classify_missing_confidence(
+            col,
+            args,
+            cascade=cascade,
+            id_range=id_range,
+            progress=lambda n: queue.put(("progress", shard_idx, n)),
+            tag=f"shard {shard_idx}",
+        )
+        queue.put(("done", shard_idx, stats))
+    except Exception as e:
+        queue.put(("error", shard_idx, str(e)))
+        raise
+    finally:
+        client.close()
+
+def classify_missing_sharded(col, args, cascade=None) -> Dict[str, Any]:
+    """
+    --workers N: shard the unscored _id space into N contiguous ranges and
+    classify each range in its own process with a fixed torch thread budget.
+    The parent only shows aggregate progress and throughput. A worker that dies
+    without reporting (OOM kill, segfault) is marked failed instead of hanging
+    the parent.
+    """
+    import multiprocessing as mp
+
+    shards = _shard_bounds(col, _missing_query(args, cascade), args.workers, limit=args.limit)
+    if not shards:
+        print("[workers] nothing to classify.")
+        return {}
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // len(shards))
+    print(f"[workers] shards={len(shards)} threads_per_worker={threads} docs={sum(n for _, _, n in shards)}")
+
+    # Each worker handles its whole range; --limit was already applied when cutting shards.
+    worker_args = argparse.Namespace(**{**vars(args), "limit": 0})
+
+    ctx = mp.get_context("spawn")
+    events = ctx.Queue()
+    procs = [
+        ctx.Process(target=_shard_worker, args=(i, (lo, hi), worker_args, cascade, threads, events))
+        for i, (lo, hi, _) in enumerate(shards)
+    ]
+    t0 = time.perf_counter()
+    for proc in procs:
+        proc.start()
+
+    results: Dict[int, Dict[str, Any]] = {}
+    failed: Dict[int, str] = {}
+    with tqdm(total=sum(n for _, _, n in shards), desc="classify (all shards)") as bar:
+        while len(results) + len(failed) < len(procs):
+            try:
+                kind, shard_idx, payload = events.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                # Nothing for a while: any worker that exited without "done"/"error" was killed.
+                for i, proc in enumerate(procs):
+                    if i not in results and i not in failed and not proc.is_alive():
+                        failed[i] = f"worker died without reporting (exitcode={proc.exitcode})"
+                continue
+            if kind == "progress":
+                bar.update(payload)
+                elapsed = time.perf_counter() - t0
+                bar.set_postfix(docs_per_sec=f"{bar.n / elapsed:.2f}" if elapsed else "-")
+            elif kind == "done":
+                results[shard_idx] = payload
+            else:
+                failed[shard_idx] = payload
+    for proc in procs:
+        proc.join()
+    wall = time.perf_counter() - t0
+
+    print("\n[workers] per-shard throughput:")
+    for i in sorted(results):
+        st = results[i]
+        rate = st.get("docs", 0) / st["seconds"] if st.get("seconds") else 0.0
+        print(f"  shard {i}: scanned={int(st.get('scanned', 0))} inferred={int(st.get('docs', 0))} model_docs_per_sec={rate:.2f}")
+    for i, err in sorted(failed.items()):
+        print(f"  shard {i}: FAILED ({err})")
+    if failed:
+        print(f"[workers] {len(failed)} shard(s) failed; rerun with --resume to classify their remaining docs "
+              "(shards are cut from still-unscored docs, so finished work is skipped).")
+
+    scanned = sum(st.get("scanned", 0) for st in results.values())
+    inferred = sum(st.get("docs", 0) for st in results.values())
+    print(
+        f"[workers] total scanned={int(scanned)} inferred={int(inferred)} wall={wall:.1f}s "
+        f"aggregate_docs_per_sec={scanned / wall if wall else 0.0:.2f}"
+    )
+    return _merge_stats(list(results.values()))
 
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(round(q / 100.0 * (len(ordered) - 1))), len(ordered) - 1)]
+
+def _merge_stats(all_stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum numeric counters and concatenate latency lists across shards."""
+    merged: Dict[str, Any] = {}
+    for st in all_stats:
+        for k, v in st.items():
+            if isinstance(v, list):
+                merged.setdefault(k, []).extend(v)
+            elif isinstance(v, (int, float)):
+                merged[k] = merged.get(k, 0) + v
+    return merged
+
+def _run_summary(args, stats: Dict[str, Any], *, started_at: datetime, wall_seconds: float) -> Dict[str, Any]:
+    """One document describing a classification run (config + throughput + latency)."""
+    from hf_class import HF_BACKEND, HF_MODEL_NAME, HF_NLI_MODE
+
+    real, padded = stats.get("real_tokens", 0), stats.get("padded_tokens", 0)
+    infer = stats.get("seconds", 0.0)
+    lat = stats.get("forward_ms", [])
+    hits, misses = stats.get("cache_hits", 0), stats.get("cache_misses", 0)
+    return {
+        "run_type": "classify_missing",
+        "started_at": started_at,
+        "finished_at": datetime.now(timezone.utc),
+        "db": args.db,
+        "collection": args.collection,
+        "config": {
+            "model": HF_MODEL_NAME,
+            "backend": args.backend or HF_BACKEND,
+            "nli_mode": args.nli_mode or HF_NLI_MODE,
+            "infer_batch": args.infer_batch,
+            "max_chars": args.max_chars,
+            "min_length": args.min_length,
+            "threshold": args.threshold,
+            "workers": args.workers,
+            "cascade": args.cascade,
+            "windows": args.windows,
+            "passages": args.passages,
+            "cache": not args.no_cache,
+            "dry_run": args.dry_run,
+        },
+        "scanned": int(stats.get("scanned", 0)),
+        "inferred_docs": int(stats.get("docs", 0)),
+        "wall_seconds": wall_seconds,
+        "mongo_read_seconds": stats.get("read_seconds", 0.0),
+        "inference_seconds": stats.get("infer_seconds", 0.0),
+        "mongo_write_seconds": stats.get("write_seconds", 0.0),
+        "docs_per_sec": stats.get("docs", 0) / infer if infer else None,
+        "tokens_per_sec": real / infer if infer else None,
+        "forward_batches": int(stats.get("batches", 0)),
+        "real_tokens": int(real),
+        "padded_tokens": int(padded),
+        "padding_waste": 1.0 - real / padded if padded else None,
+        "forward_ms_p50": _percentile(lat, 50),
+        "forward_ms_p90": _percentile(lat, 90),
+        "forward_ms_p99": _percentile(lat, 99),
+        "cache_hit_rate": hits / (hits + misses) if (hits + misses) else None,
+    }
+
+def save_run_summary(db, summary: Dict[str, Any], runs_dir: str = RUNS_DIR) -> str:
+    """
+    Write the summary to runs_dir/run_<timestamp>_<_id>.json (the run _id keeps
+    runs finishing in the same second apart) and insert it into the `runs`
+    collection. Dry runs only get the local file, tagged _dryrun.
+    """
+    summary = {"_id": ObjectId(), **summary}
+    dry_run = summary.get("config", {}).get("dry_run", False)
+    os.makedirs(runs_dir, exist_ok=True)
+    name = f"run_{summary['started_at']:%Y%m%dT%H%M%S}_{summary['_id']}{'_dryrun' if dry_run else ''}.json"
+    path = os.path.join(runs_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, default=str)
+    if not dry_run:
+        try:
+            db[RUNS_COLLECTION].insert_one(summary)
+        except PyMongoError as e:
+            print(f"[Mongo] could not store run summary: {e}")
     print(
-        f"[classify_missing] scanned={scanned} attempted_inference={attempted} "
-        f"dry_run={args.dry_run} force={args.force}"
+        f"[run] docs_per_sec={summary['docs_per_sec'] or 0:.2f} tokens_per_sec={summary['tokens_per_sec'] or 0:.0f} "
+        f"padding_waste={summary['padding_waste'] or 0:.1%} forward_ms p50/p90/p99="
+        f"{summary['forward_ms_p50'] or 0:.0f}/{summary['forward_ms_p90'] or 0:.0f}/{summary['forward_ms_p99'] or 0:.0f}"
     )
+    print(f"[run] summary saved to {path}" + ("" if dry_run else f" and {RUNS_COLLECTION} collection"))
+    return path
+
+def _checkpoint_config(args) -> Dict[str, Any]:
+    """The settings that define "the same run" for --resume."""
+    keys = ["db", "collection", "threshold", "force", "min_length", "max_chars", "limit", "hybrid",
+            "relabel_only", "cascade", "windows", "window_tokens", "window_overlap", "window_agg",
+            "passages", "backend", "nli_mode", "paper_thresholds"]
+    return {k: getattr(args, k) for k in keys}
 
 def main() -> None:
     args = parse_args()
@@ -333,23 +1179,58 @@ def main() -> None:
     client = MongoClient(MONGO_URI)
     col = client[args.db][args.collection]
 
+    paper_map = None
+    if args.paper_thresholds:
+        map_default, paper_map = load_paper_thresholds(args.paper_thresholds)
+        paper_default = map_default if map_default is not None else args.threshold
+
+    checkpoint = None
+    per_paper_only = args.relabel_only and not args.hybrid and paper_map is not None
+    if not args.dry_run and not args.debug_id and (args.hybrid or args.relabel_only) and not per_paper_only:
+        checkpoint = RunCheckpoint(client[args.db], _checkpoint_config(args), resume=args.resume)
+
     # --- HYBRID MODE (what you want) ---
     if args.hybrid:
         print("[run_hf] Hybrid mode:")
         print("  1) Relabel docs that already have hf_confidence using current threshold")
         print("  2) Classify docs missing hf_confidence (newly scraped)")
 
-        # 1) relabel existing confidence
-        relabel_from_confidence(
-            col,
-            args.threshold,
-            debug_id=args.debug_id,
-            dry_run=args.dry_run,
-            limit=args.limit,
-        )
+        # 1) relabel existing confidence (per-paper maps run after step 2 so new docs are covered too)
+        if paper_map is None:
+            relabel_from_confidence(
+                col,
+                args.threshold,
+                debug_id=args.debug_id,
+                dry_run=args.dry_run,
+                limit=args.limit,
+                checkpoint=checkpoint,
+            )
 
         # 2) classify missing confidence
-        classify_missing_confidence(col, args)
+        cascade = None
+        if args.cascade:
+            from cascade import build_cascade
+            cascade = build_cascade(
+                client[args.db][args.cascade_train],
+                target_agreement=args.cascade_target,
+                max_chars=args.max_chars,
+            )
+        started_at = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+        if args.workers > 1:
+            # Shards are cut from the still-unscored docs, so a restarted
+            # sharded run naturally skips finished work (no per-shard checkpoint).
+            stats = classify_missing_sharded(col, args, cascade=cascade)
+        else:
+            _configure_classifier(args)
+            stats = classify_missing_confidence(col, args, cascade=cascade, checkpoint=checkpoint)
+        summary = _run_summary(args, stats, started_at=started_at, wall_seconds=time.perf_counter() - t0)
+        save_run_summary(client[args.db], summary)
+        if paper_map is not None:
+            # single idempotent update_many, not checkpointed: rerunning after a crash just repeats it
+            relabel_per_paper(col, paper_map, paper_default, debug_id=args.debug_id, dry_run=args.dry_run)
+        if checkpoint is not None:
+            checkpoint.finish()
 
         print("[run_hf] Done (hybrid).")
         return
@@ -357,13 +1238,19 @@ def main() -> None:
     # --- Existing modes preserved ---
     if args.relabel_only:
         print("[run_hf] Relabel-only mode: updating labels from existing hf_confidence (no HF inference).")
+        if paper_map is not None:
+            relabel_per_paper(col, paper_map, paper_default, debug_id=args.debug_id, dry_run=args.dry_run)
+            return
         relabel_from_confidence(
             col,
             args.threshold,
             debug_id=args.debug_id,
             dry_run=args.dry_run,
             limit=args.limit,
+            checkpoint=checkpoint,
         )
+        if checkpoint is not None:
+            checkpoint.finish()
         return
 
 if __name__ == "__main__":
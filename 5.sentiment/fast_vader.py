@@ -0,0 +1,265 @@
+"""
+Batch VADER scorer that reproduces NLTK's SentimentIntensityAnalyzer.polarity_scores.
+
+NLTK scores one text at a time and its hot loops are quadratic per text:
+tokenising builds a (punctuation x word) product dict, and every token's
+position is found with list.index(). Here a whole batch is tokenised into one
+flat token array (per-token work is a few dict lookups), and the rules run as
+NumPy operations over all tokens at once:
+
+- lexicon valence and booster scalars are precompiled lookup tables
+- ALL-CAPS emphasis, the three-word booster/dampener window, negation
+  ("never so" / "n't" / NEGATE words), "least" and the "but" shift are
+  shifted-array ops
+- idioms only fire next to a handful of words, so those few positions use
+  the scalar rule
+
+NLTK quirks are kept on purpose: a repeated token reuses the valence of its
+first occurrence (polarity_scores looks positions up with list.index), and
+the idiom / "never" checks are case-sensitive.
+
+Lexicon and constants are taken from the installed NLTK analyzer, so the two
+share one source of truth. parity_vader.py checks agreement and speed.
+"""
+import math
+import re
+import string
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_PUNCT_CHARS = set(string.punctuation)
+_STRIP_RE = re.compile(f"[{re.escape(string.punctuation)}]")
+
+NEVER_SO_1 = 1.5    # "never so <word>" (start_i == 1)
+NEVER_SO_2 = 1.25   # "never so x <word>" / "so <word>" at start_i == 2
+DIST_DAMP = (1.0, 0.95, 0.9)  # booster weight by distance from the sentiment word
+
+
+class FastVader:
+    def __init__(self, sia=None):
+        if sia is None:
+            from nltk.sentiment.vader import SentimentIntensityAnalyzer
+            sia = SentimentIntensityAnalyzer()
+        c = getattr(sia, "constants", None)
+        if c is None:  # very old NLTK: constants at module level
+            import nltk.sentiment.vader as c
+        self.lexicon: Dict[str, float] = dict(sia.lexicon)
+        self.booster: Dict[str, float] = dict(c.BOOSTER_DICT)
+        self.negate = frozenset(c.NEGATE)
+        self.idioms: Dict[str, float] = dict(c.SPECIAL_CASE_IDIOMS)
+        self.punc = frozenset(c.PUNC_LIST)
+        self.c_incr = float(c.C_INCR)
+        self.b_decr = float(c.B_DECR)
+        self.n_scalar = float(c.N_SCALAR)
+        # first words of every idiom / multi-word booster: only positions near one of these need the idiom check
+        self._idiom_heads = {k.split(" ")[0] for k in list(self.idioms) + [b for b in self.booster if " " in b]}
+
+    # ----------------------------
+    # Tokenisation (same output as nltk SentiText.words_and_emoticons)
+    # ----------------------------
+    def tokens(self, text: str) -> List[str]:
+        toks = [t for t in text.split() if len(t) > 1]
+        if not toks:
+            return toks
+        words_only = None
+        for k, t in enumerate(toks):
+            lead = t[0] in _PUNCT_CHARS
+            trail = t[-1] in _PUNCT_CHARS
+            if not (lead or trail):
+                continue
+            if words_only is None:
+                words_only = {w for w in _STRIP_RE.sub("", text).split() if len(w) > 1}
+            # "p+word" or "word+p" with p in PUNC_LIST and word a punctuation-free word of the text
+            if trail:
+                e = len(t)
+                while e > 0 and t[e - 1] in _PUNCT_CHARS:
+                    e -= 1
+                if t[e:] in self.punc and t[:e] in words_only:
+                    toks[k] = t[:e]
+                    continue
+            if lead:
+                b = 0
+                while b < len(t) and t[b] in _PUNCT_CHARS:
+                    b += 1
+                if t[:b] in self.punc and t[b:] in words_only:
+                    toks[k] = t[b:]
+        return toks
+
+    # ----------------------------
+    # Scoring
+    # ----------------------------
+    def _idiom_check(self, valence: float, w: List[str], i: int) -> float:
+        """nltk _idioms_check on one position (w = raw tokens of the doc)."""
+        onezero = f"{w[i - 1]} {w[i]}"
+        twoonezero = f"{w[i - 2]} {w[i - 1]} {w[i]}"
+        twoone = f"{w[i - 2]} {w[i - 1]}"
+        threetwoone = f"{w[i - 3]} {w[i - 2]} {w[i - 1]}"
+        threetwo = f"{w[i - 3]} {w[i - 2]}"
+        for seq in (onezero, twoonezero, twoone, threetwoone, threetwo):
+            if seq in self.idioms:
+                valence = self.idioms[seq]
+                break
+        if len(w) - 1 > i:
+            zeroone = f"{w[i]} {w[i + 1]}"
+            if zeroone in self.idioms:
+                valence = self.idioms[zeroone]
+        if len(w) - 1 > i + 1:
+            zeroonetwo = f"{w[i]} {w[i + 1]} {w[i + 2]}"
+            if zeroonetwo in self.idioms:
+                valence = self.idioms[zeroonetwo]
+        if threetwo in self.booster or twoone in self.booster:
+            valence = valence + self.b_decr
+        return valence
+
+    def polarity_scores_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        texts = [t if isinstance(t, str) else str(t) for t in texts]
+        n_docs = len(texts)
+        docs_tokens = [self.tokens(t) for t in texts]
+        lengths = np.fromiter((len(t) for t in docs_tokens), dtype=np.int64, count=n_docs)
+        n = int(lengths.sum())
+        results: List[Optional[Dict[str, float]]] = [None] * n_docs
+        if n == 0:
+            return [{"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0} for _ in texts]
+
+        flat: List[str] = [w for toks in docs_tokens for w in toks]
+        starts = np.r_[0, np.cumsum(lengths)[:-1]]
+        doc_of = np.repeat(np.arange(n_docs), lengths)
+        pos = np.arange(n) - starts[doc_of]
+
+        # Per-token tables (one dict lookup each)
+        lower = [w.lower() for w in flat]
+        lex = self.lexicon
+        val = np.array([lex.get(w, np.nan) for w in lower])
+        in_lex = ~np.isnan(val)
+        boost = np.array([self.booster.get(w, 0.0) for w in lower])
+        is_boost = np.array([w in self.booster for w in lower])
+        upper = np.array([w.isupper() for w in flat])
+        neg = np.array([w in self.negate or "n't" in w for w in lower])
+
+        def eq(words: List[str], target: str) -> np.ndarray:
+            return np.array([w == target for w in words])
+
+        is_kind, is_of, is_least, is_at, is_very, is_but = (eq(lower, t) for t in ("kind", "of", "least", "at", "very", "but"))
+        raw_never = eq(flat, "never")
+        raw_so_this = eq(flat, "so") | eq(flat, "this")
+        head = np.array([w in self._idiom_heads for w in flat])
+
+        allcaps = np.bincount(doc_of, weights=upper, minlength=n_docs)
+        cap_diff = ((lengths - allcaps) > 0) & ((lengths - allcaps) < lengths)
+        cap_tok = cap_diff[doc_of]
+
+        def back(a, k, fill):
+            """a shifted so that out[g] = a[g - k] (fill where that crosses the doc start)."""
+            out = np.full_like(a, fill)
+            out[k:] = a[:-k]
+            out[pos < k] = fill
+            return out
+
+        def fwd(a, k, fill):
+            out = np.full_like(a, fill)
+            out[:-k] = a[k:]
+            out[pos >= (lengths[doc_of] - k)] = fill
+            return out
+
+        # Sentiment-laden words + caps emphasis
+        v = np.where(in_lex, val, 0.0)
+        caps = upper & cap_tok & in_lex
+        v = np.where(caps, np.where(v > 0, v + self.c_incr, v - self.c_incr), v)
+
+        idiom_rows: List[int] = []
+        for start_i in range(3):
+            k = start_i + 1
+            cond = in_lex & (pos > start_i) & ~back(in_lex, k, True)
+            # booster / dampener k words back (scalar_inc_dec)
+            s = back(boost, k, 0.0)
+            s = np.where(v < 0, -s, s)
+            b_caps = back(is_boost, k, False) & back(upper, k, False) & cap_tok
+            s = np.where(b_caps, np.where(v > 0, s + self.c_incr, s - self.c_incr), s)
+            s = s * DIST_DAMP[start_i]
+            v = np.where(cond, v + s, v)
+
+            # _never_check
+            if start_i == 0:
+                mult = np.where(back(neg, 1, False), self.n_scalar, 1.0)
+            elif start_i == 1:
+                never_so = back(raw_never, 2, False) & back(raw_so_this, 1, False)
+                mult = np.where(never_so, NEVER_SO_1, np.where(back(neg, 2, False), self.n_scalar, 1.0))
+            else:
+                never_so = (back(raw_never, 3, False) & back(raw_so_this, 2, False)) | back(raw_so_this, 1, False)
+                mult = np.where(never_so, NEVER_SO_2, np.where(back(neg, 3, False), self.n_scalar, 1.0))
+                near_head = head | back(head, 1, False) | back(head, 2, False) | back(head, 3, False)
+                idiom_rows = np.flatnonzero(cond & near_head).tolist()
+            v = np.where(cond, v * mult, v)
+
+        # idioms: scalar rule on the few candidate positions (applied after the start_i == 2 never check)
+        for g in idiom_rows:
+            d = doc_of[g]
+            st = starts[d]
+            v[g] = self._idiom_check(v[g], flat[st:st + lengths[d]], int(pos[g]))
+
+        # _least_check
+        least1 = back(is_least, 1, False) & ~back(in_lex, 1, True)
+        not_at_very = ~(back(is_at, 2, False) | back(is_very, 2, False))
+        least = np.where(pos > 1, least1 & not_at_very, (pos > 0) & least1)
+        v = np.where(in_lex & least, v * self.n_scalar, v)
+
+        # boosters and "kind of" contribute 0; non-lexicon words contribute 0
+        kind_of = is_kind & fwd(is_of, 1, False)
+        v = np.where(in_lex & ~is_boost & ~kind_of, v, 0.0)
+
+        # NLTK looks positions up with list.index(): a repeated token takes its first occurrence's value
+        first = np.empty(n, dtype=np.int64)
+        g = 0
+        for toks in docs_tokens:
+            seen: Dict[str, int] = {}
+            base = g
+            for k, w in enumerate(toks):
+                first[g] = base + seen.setdefault(w, k)
+                g += 1
+        sent = v[first]
+
+        # _but_check: first "but" (lowercase) in the doc
+        big = np.iinfo(np.int64).max
+        bi = np.full(n_docs, big, dtype=np.int64)
+        np.minimum.at(bi, doc_of[is_but], pos[is_but])
+        bi_tok = bi[doc_of]
+        has_but = bi_tok != big
+        sent = np.where(has_but & (pos < bi_tok), sent * 0.5, np.where(has_but & (pos > bi_tok), sent * 1.5, sent))
+
+        # score_valence
+        sum_s = np.bincount(doc_of, weights=sent, minlength=n_docs)
+        pos_sum = np.bincount(doc_of, weights=np.where(sent > 0, sent + 1, 0.0), minlength=n_docs)
+        neg_sum = np.bincount(doc_of, weights=np.where(sent < 0, sent - 1, 0.0), minlength=n_docs)
+        neu_count = np.bincount(doc_of, weights=(sent == 0), minlength=n_docs)
+
+        for d, text in enumerate(texts):
+            if lengths[d] == 0:
+                results[d] = {"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0}
+                continue
+            ep = min(text.count("!"), 4) * 0.292
+            qm = text.count("?")
+            qm = (qm * 0.18 if qm <= 3 else 0.96) if qm > 1 else 0
+            amp = ep + qm
+            s = float(sum_s[d])
+            if s > 0:
+                s += amp
+            elif s < 0:
+                s -= amp
+            compound = s / math.sqrt((s * s) + 15)
+            p, ng, nu = float(pos_sum[d]), float(neg_sum[d]), int(neu_count[d])
+            if p > math.fabs(ng):
+                p += amp
+            elif p < math.fabs(ng):
+                ng -= amp
+            total = p + math.fabs(ng) + nu
+            results[d] = {
+                "neg": round(math.fabs(ng / total), 3),
+                "neu": round(math.fabs(nu / total), 3),
+                "pos": round(math.fabs(p / total), 3),
+                "compound": round(compound, 4),
+            }
+        return results
+
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        return self.polarity_scores_batch([text])[0]
@@ -0,0 +1,94 @@
+"""
+Parity check + throughput benchmark: fast_vader.FastVader vs NLTK VADER.
+
+Scores the same article texts (built exactly like sent_analysis.py) with both
+engines and reports:
+- exact-match rate and max |diff| for compound / pos / neg / neu
+- sentiment label agreement (label_from_compound)
+- docs/sec for each engine and the speedup
+Mismatching docs are listed (first --show) so rule differences can be traced.
+
+  python parity_vader.py --n 5000
+  python parity_vader.py --n 2000 --query all --batch 512
+"""
+import argparse
+import time
+
+from pymongo.mongo_client import MongoClient
+
+from fast_vader import FastVader
+from sent_analysis import DB_NAME, MONGO_URI, COLLECTION_NAME, build_text, get_sia, label_from_compound
+
+FIELDS = ("compound", "pos", "neg", "neu")
+
+
+def load_texts(collection: str, n: int, query_mode: str, max_chars: int):
+    col = MongoClient(MONGO_URI)[DB_NAME][collection]
+    query = {"text": {"$exists": True}}
+    if query_mode == "protest":
+        query["hf_label_name"] = "PROTEST"
+    docs = col.find(query, {"_id": 1, "title": 1, "text": 1}).limit(n)
+    ids, texts = [], []
+    for d in docs:
+        t = build_text(d, max_chars=max_chars)
+        if t:
+            ids.append(d["_id"])
+            texts.append(t)
+    return ids, texts
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--collection", default=COLLECTION_NAME)
+    p.add_argument("--n", type=int, default=2000)
+    p.add_argument("--query", choices=["protest", "all"], default="protest")
+    p.add_argument("--max_chars", type=int, default=4000)
+    p.add_argument("--batch", type=int, default=256, help="Docs per FastVader batch.")
+    p.add_argument("--tol", type=float, default=1e-4, help="Max |diff| counted as a match.")
+    p.add_argument("--show", type=int, default=10)
+    args = p.parse_args()
+
+    ids, texts = load_texts(args.collection, args.n, args.query, args.max_chars)
+    print(f"[parity] {len(texts)} texts loaded")
+    if not texts:
+        return
+
+    sia = get_sia()
+    fast = FastVader(sia)
+
+    t0 = time.perf_counter()
+    ref = [sia.polarity_scores(t) for t in texts]
+    t_nltk = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    got = []
+    for i in range(0, len(texts), args.batch):
+        got.extend(fast.polarity_scores_batch(texts[i:i + args.batch]))
+    t_fast = time.perf_counter() - t0
+
+    n = len(texts)
+    mismatches = []
+    max_diff = {f: 0.0 for f in FIELDS}
+    label_agree = 0
+    for i, (r, g) in enumerate(zip(ref, got)):
+        diffs = {f: abs(r[f] - g[f]) for f in FIELDS}
+        for f in FIELDS:
+            max_diff[f] = max(max_diff[f], diffs[f])
+        if max(diffs.values()) > args.tol:
+            mismatches.append(i)
+        label_agree += label_from_compound(r["compound"]) == label_from_compound(g["compound"])
+
+    print(f"\n[parity] exact (|diff| <= {args.tol:g}): {n - len(mismatches)}/{n} ({(n - len(mismatches)) / n:.2%})")
+    print("[parity] max |diff|: " + "  ".join(f"{f}={max_diff[f]:.4f}" for f in FIELDS))
+    print(f"[parity] label agreement: {label_agree}/{n} ({label_agree / n:.2%})")
+    for i in mismatches[: args.show]:
+        print(f"  {ids[i]}: nltk={ref[i]} fast={got[i]}")
+
+    print(
+        f"\n[bench] nltk: {n / t_nltk:.1f} docs/sec ({t_nltk:.2f}s)  "
+        f"fast: {n / t_fast:.1f} docs/sec ({t_fast:.2f}s)  speedup x{t_nltk / t_fast:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,7 @@ import re
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from dateutil import parser as dateparser
 from pymongo import MongoClient
@@ -69,6 +70,9 @@ class TopicConfig:
 
     # Topic model knobs
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Article embeddings stored by run_hf.py --backend biencoder (same model);
+    # reused instead of encoding again. Set to None to always encode.
+    stored_embedding_field: Optional[str] = "emb_minilm"
     min_topic_size: int = 40
     nr_topics: Optional[int] = None  # set e.g. 20 to force fewer topics
 
@@ -138,6 +142,9 @@ def load_protest_articles(mcfg: MongoConfig, cfg: TopicConfig) -> pd.DataFrame:
         cfg.paper_field: 1,
         cfg.date_field: 1,
     }
+    if cfg.stored_embedding_field:
+        projection[cfg.stored_embedding_field] = 1
+        projection["emb_model"] = 1
 
     rows = list(col.find(cfg.protest_filter, projection=projection))
     if not rows:
@@ -152,6 +159,14 @@ def load_protest_articles(mcfg: MongoConfig, cfg: TopicConfig) -> pd.DataFrame:
         }
     )
 
+    # Keep stored embeddings only if they come from the model we would use.
+    if cfg.stored_embedding_field and cfg.stored_embedding_field in df.columns and "emb_model" in df.columns:
+        same_model = df["emb_model"] == cfg.embedding_model_name
+        df["stored_embedding"] = df[cfg.stored_embedding_field].where(same_model, None)
+        df = df.drop(columns=[cfg.stored_embedding_field, "emb_model"], errors="ignore")
+    else:
+        df["stored_embedding"] = None
+
     df["published_date"] = df["published_date"].apply(parse_date)
     df = df.dropna(subset=["published_date"]).copy()
 
@@ -171,8 +186,19 @@ def load_protest_articles(mcfg: MongoConfig, cfg: TopicConfig) -> pd.DataFrame:
 def fit_bertopic(df: pd.DataFrame, cfg: TopicConfig) -> Tuple[BERTopic, List[int], List[float]]:
     docs = df["text"].tolist()
 
-    embedder = SentenceTransformer(cfg.embedding_model_name)
-    embeddings = embedder.encode(docs, show_progress_bar=True, batch_size=64)
+    # Reuse embeddings from the bi-encoder classifier; encode only the rest.
+    # (Those were computed on the raw article text; clean_text only strips
+    # boilerplate lines, and MiniLM reads the first 256 tokens anyway.)
+    stored = df["stored_embedding"].tolist()
+    missing = [i for i, e in enumerate(stored) if e is None or (isinstance(e, float) and pd.isna(e))]
+    print(f"Embeddings: reusing {len(docs) - len(missing):,} stored, encoding {len(missing):,}")
+    if missing:
+        embedder = SentenceTransformer(cfg.embedding_model_name)
+        fresh = embedder.encode([docs[i] for i in missing], show_progress_bar=True, batch_size=64,
+                                normalize_embeddings=True)
+        for i, e in zip(missing, fresh):
+            stored[i] = e
+    embeddings = np.vstack([np.asarray(e, dtype=np.float32) for e in stored])
 
     vectorizer_model = CountVectorizer(
         stop_words="english",
@@ -221,7 +247,9 @@ def build_topic_tables(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd
 def export_results(out_dir: str, df: pd.DataFrame, topic_model: BERTopic) -> None:
     os.makedirs(out_dir, exist_ok=True)
 
-    df.to_csv(os.path.join(out_dir, "articles_with_topics.csv"), index=False)
+    df.drop(columns=["stored_embedding"], errors="ignore").to_csv(
+        os.path.join(out_dir, "articles_with_topics.csv"), index=False
+    )
 
     topic_info = topic_model.get_topic_info()
     topic_info.to_csv(os.path.join(out_dir, "topic_info.csv"), index=False)
@@ -23,6 +23,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pymongo import MongoClient
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 
 # ----------------------------
 # Config
@@ -52,12 +54,13 @@ TOP_K_PEAKS = 6            # number of peaks to label
 # ----------------------------
 # Data loading
 # ----------------------------
-def load_from_mongo() -> pd.DataFrame:
+def load_from_mongo(threshold=None) -> pd.DataFrame:
     client = MongoClient(MONGO_URI)
     col = client[DB_NAME][COLLECTION_NAME]
 
     projection = {DATE_FIELD: 1, "sentiment": 1, "_id": 0}
-    docs = list(col.find(PROTEST_FILTER, projection))
+    query = apply_protest_filter(dict(PROTEST_FILTER), col, threshold, sentiment_field=f"{SENTIMENT_FIELD}.compound")
+    docs = list(col.find(query, projection))
     if not docs:
         raise RuntimeError("Query returned 0 docs. Check PROTEST_FILTER and field names.")
 
@@ -173,7 +176,7 @@ def plot(df: pd.DataFrame, outpath: Path) -> None:
 
 def main():
     outpath = Path("7.2figures/sentiment_over_time.png")
-    df = load_from_mongo()
+    df = load_from_mongo(parse_threshold())
     plot(df, outpath)
     print(f"Saved: {outpath.resolve()}")
 
@@ -15,6 +15,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pymongo import MongoClient
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 # ----------------------------
 # Config
 # ---------------------------- 
@@ -79,7 +81,7 @@ def _require_env():
         )
 
 
-def load_df() -> pd.DataFrame:
+def load_df(threshold=None) -> pd.DataFrame:
     _require_env()
 
     client = MongoClient(MONGO_URI)
@@ -91,6 +93,7 @@ def load_df() -> pd.DataFrame:
     }
     if PROTEST_ONLY:
         query["hf_label_name"] = "PROTEST"
+        query = apply_protest_filter(query, col, threshold)
     if MIN_TEXT_CHARS is not None:
         query["text"] = {"$exists": True}
 
@@ -242,7 +245,7 @@ def plot_distribution_by_period(df: pd.DataFrame) -> None:
 
 
 def main():
-    df = load_df()
+    df = load_df(parse_threshold())
 
     print("Loaded rows:", len(df))
     print("Date range:", df["publish_date"].min().date(), "to", df["publish_date"].max().date())
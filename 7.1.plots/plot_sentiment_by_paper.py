@@ -24,6 +24,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pymongo import MongoClient
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 
 # ----------------------------
 # Config
@@ -90,7 +92,7 @@ def _require_env():
         )
 
 
-def load_df() -> pd.DataFrame:
+def load_df(threshold=None) -> pd.DataFrame:
     _require_env()
 
     client = MongoClient(MONGO_URI)
@@ -103,6 +105,7 @@ def load_df() -> pd.DataFrame:
     }
     if PROTEST_ONLY:
         query["hf_label_name"] = "PROTEST"
+        query = apply_protest_filter(query, col, threshold)
 
     projection = {
         "_id": 0,
@@ -285,7 +288,7 @@ def plot_distribution_by_paper_by_period(df: pd.DataFrame) -> None:
 
 
 def main():
-    df = load_df()
+    df = load_df(parse_threshold())
     df = filter_papers(df)
 
     print("Loaded rows:", len(df))
@@ -19,6 +19,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pymongo import MongoClient
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 
 # ----------------------------
 # Config 
@@ -45,7 +47,7 @@ OUT_DIR = Path("7.2figures")
 OUT_FILE = OUT_DIR / "sentiment_composition_over_time.png"
 
 
-def load_labels_from_mongo() -> pd.DataFrame:
+def load_labels_from_mongo(threshold=None) -> pd.DataFrame:
     if not MONGO_URI:
         raise RuntimeError(
             "MONGO_URI is not set. Export it in your shell, e.g.\n"
@@ -61,6 +63,7 @@ def load_labels_from_mongo() -> pd.DataFrame:
     }
     if PROTEST_ONLY:
         query["hf_label_name"] = "PROTEST"
+        query = apply_protest_filter(query, col, threshold)
 
     projection = {
         "_id": 0,
@@ -164,7 +167,7 @@ def plot_composition(df: pd.DataFrame) -> None:
 
 
 def main():
-    df = load_labels_from_mongo()
+    df = load_labels_from_mongo(parse_threshold())
     print("Loaded rows:", len(df))
     print("Date range:", df["publish_date"].min().date(), "to", df["publish_date"].max().date())
     print("Label counts:")
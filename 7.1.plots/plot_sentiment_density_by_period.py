@@ -21,6 +21,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pymongo import MongoClient
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 
 # ----------------------------
 # Config
@@ -47,7 +49,7 @@ OUT_DIR = Path("7.2figures")
 OUT_FILE = OUT_DIR / "sentiment_density_by_period.png"
 
 
-def load_df() -> pd.DataFrame:
+def load_df(threshold=None) -> pd.DataFrame:
     if not MONGO_URI:
         raise RuntimeError(
             "MONGO_URI is not set. Export it in your shell, e.g.\n"
@@ -63,6 +65,7 @@ def load_df() -> pd.DataFrame:
     }
     if PROTEST_ONLY:
         query["hf_label_name"] = "PROTEST"
+        query = apply_protest_filter(query, col, threshold)
 
     projection = {
         "_id": 0,
@@ -165,7 +168,7 @@ def plot_density(df: pd.DataFrame) -> None:
 
 
 def main():
-    df = load_df()
+    df = load_df(parse_threshold())
     df = assign_period(df)
 
     print("Loaded rows:", len(df))
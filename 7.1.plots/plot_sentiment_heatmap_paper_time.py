@@ -21,6 +21,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pymongo import MongoClient
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 
 # ----------------------------
 # Config
@@ -48,7 +50,7 @@ OUT_DIR = Path("7.2figures")
 OUT_FILE = OUT_DIR / "sentiment_heatmap_paper_time.png"
 
 
-def load_df() -> pd.DataFrame:
+def load_df(threshold=None) -> pd.DataFrame:
     if not MONGO_URI:
         raise RuntimeError(
             "MONGO_URI is not set. Export it in your shell, e.g.\n"
@@ -65,6 +67,7 @@ def load_df() -> pd.DataFrame:
     }
     if PROTEST_ONLY:
         query["hf_label_name"] = "PROTEST"
+        query = apply_protest_filter(query, col, threshold)
 
     projection = {
         "_id": 0,
@@ -172,7 +175,7 @@ def plot_heatmap(pivot: pd.DataFrame) -> None:
 
 
 def main():
-    df = load_df()
+    df = load_df(parse_threshold())
     print("Loaded rows:", len(df))
     print("Papers (raw):", df["paper"].nunique())
     print("Date range:", df["publish_date"].min().date(), "to", df["publish_date"].max().date())
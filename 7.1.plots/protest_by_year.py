@@ -2,6 +2,8 @@
 import pandas as pd
 from pymongo import MongoClient
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 # =========================
 # CONFIG
 # =========================
@@ -48,10 +50,11 @@ def build_match(label_mode: str, require_sentiment: bool) -> dict:
 
 
 def main():
+    threshold = parse_threshold("Count PROTEST articles by year and outlet.")
     client = MongoClient(MONGO_URI)
     col = client[DB_NAME][COLLECTION_NAME]
 
-    match = build_match(LABEL_MODE, REQUIRE_SENTIMENT)
+    match = apply_protest_filter(build_match(LABEL_MODE, REQUIRE_SENTIMENT), col, threshold)
 
     pipeline = [
         {"$match": match},
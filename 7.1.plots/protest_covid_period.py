@@ -13,6 +13,8 @@ Time periods:
 from pymongo import MongoClient
 import pandas as pd
 
+from protest_filter import ensure_confidence_index, parse_threshold, threshold_match
+
 # ----------------------------
 # Config
 # ----------------------------
@@ -33,20 +35,23 @@ PERIODS = [
     ("Post-COVID", "2022-02-24", "2025-01-01"), 
 ]
 
-def base_filter():
+def base_filter(threshold=None):
     f = {
         "status": "done",
         "publish_date": {"$exists": True, "$ne": None},
     }
-    if USE_THRESHOLD_LABEL:
+    if threshold is not None:
+        # What-if: decide from hf_confidence directly, stored labels ignored
+        f.update(threshold_match(threshold))
+    elif USE_THRESHOLD_LABEL:
         # Matches strings like "... -> PROTEST" in your hf_reason
         f["hf_reason"] = {"$regex": r"->\s*PROTEST\b"}
     else:
         f["hf_label_name"] = "PROTEST"
     return f
 
-def counts_by_paper_for_period(col, start, end):
-    f = base_filter()
+def counts_by_paper_for_period(col, start, end, threshold=None):
+    f = base_filter(threshold)
     f["publish_date"] = {"$gte": start, "$lt": end}
 
     pipeline = [
@@ -57,14 +62,17 @@ def counts_by_paper_for_period(col, start, end):
     rows = list(col.aggregate(pipeline))
     return {r["_id"] if r["_id"] is not None else "UNKNOWN": r["n"] for r in rows}
 
-def overall_count_for_period(col, start, end):
-    f = base_filter()
+def overall_count_for_period(col, start, end, threshold=None):
+    f = base_filter(threshold)
     f["publish_date"] = {"$gte": start, "$lt": end}
     return col.count_documents(f)
 
 def main():
+    threshold = parse_threshold("Count PROTEST articles by COVID period.")
     client = MongoClient(MONGO_URI)
     col = client[DB_NAME][COLLECTION_NAME]
+    if threshold is not None:
+        ensure_confidence_index(col)
 
     # Collect counts per paper per period
     all_papers = set()
@@ -72,9 +80,9 @@ def main():
 
     overall = {}
     for label, start, end in PERIODS:
-        overall[label] = overall_count_for_period(col, start, end)
+        overall[label] = overall_count_for_period(col, start, end, threshold)
 
-        paper_counts = counts_by_paper_for_period(col, start, end)
+        paper_counts = counts_by_paper_for_period(col, start, end, threshold)
         per_period_paper_counts[label] = paper_counts
         all_papers.update(paper_counts.keys())
 
@@ -98,7 +106,10 @@ def main():
     print("\nPROTEST article counts by COVID period (overall + by outlet)\n")
     print(df.to_string())
 
-    tell = "hf_reason (threshold-based)" if USE_THRESHOLD_LABEL else "hf_label_name"
+    if threshold is not None:
+        tell = f"hf_confidence >= {threshold} (what-if)"
+    else:
+        tell = "hf_reason (threshold-based)" if USE_THRESHOLD_LABEL else "hf_label_name"
     print(f"\nLabel source used: {tell}")
 
     out_csv = "7.3outputs/protest_counts_by_covid_period_and_outlet.csv"
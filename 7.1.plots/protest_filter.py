@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+protest_filter.py
+
+Shared "what is a PROTEST article" filter for the analytics scripts.
+
+By default the scripts keep their stored-label rule (hf_reason arrow or
+hf_label_name). With --threshold T they instead select hf_confidence >= T at
+query time, so a different threshold can be tried without running
+run_hf.py --relabel_only (no bulk writes). An index on hf_confidence keeps
+those queries cheap. Docs decided by the cascade's cheap stage
+(hf_stage == "cheap") have no hf_confidence; they keep their stored label,
+since their hf_cheap_score is on a different scale.
+
+A threshold below the stored one pulls in docs that were never scored for
+sentiment (sent_analysis.py only scores PROTEST docs by default). Sentiment
+scripts would drop them silently, so the number of selected docs without
+sentiment is printed as a warning; `5.sentiment/sent_analysis.py --scope all`
+scores them.
+"""
+
+import argparse
+from typing import Any, Dict, Optional
+
+CONFIDENCE_INDEX = "hf_confidence_1"
+STAGE_INDEX = "hf_stage_1_hf_label_name_1"
+
+
+def add_threshold_arg(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--threshold", type=float, default=None,
+        help="What-if threshold: treat hf_confidence >= THRESHOLD as PROTEST instead of the stored label.",
+    )
+
+
+def parse_threshold(description: Optional[str] = None) -> Optional[float]:
+    """For the scripts configured by constants: only --threshold is read from the command line."""
+    parser = argparse.ArgumentParser(description=description)
+    add_threshold_arg(parser)
+    return parser.parse_args().threshold
+
+
+def threshold_match(threshold: float) -> Dict[str, Any]:
+    return {"$or": [
+        {"hf_confidence": {"$gte": float(threshold)}},
+        {"hf_stage": "cheap", "hf_label_name": "PROTEST"},  # cascade stage-1 decision, no hf_confidence
+    ]}
+
+
+def ensure_confidence_index(col) -> None:
+    """Idempotent; makes both branches of threshold_match index scans."""
+    col.create_index([("hf_confidence", 1)], name=CONFIDENCE_INDEX)
+    col.create_index([("hf_stage", 1), ("hf_label_name", 1)], name=STAGE_INDEX)
+
+
+def _is_sentiment_key(key: str) -> bool:
+    return key.split(".")[0] == "sentiment"
+
+
+def warn_missing_sentiment(query: Dict[str, Any], col, field: str = "sentiment.compound") -> int:
+    """
+    Count docs selected by `query` (ignoring its sentiment conditions) that
+    have no `field`, and warn if there are any. Returns the count.
+    """
+    q = {k: v for k, v in query.items() if not _is_sentiment_key(k)}
+    q[field] = {"$exists": False}
+    n = col.count_documents(q)
+    if n:
+        print(f"[what-if] WARNING: {n} docs selected by the threshold have no {field} and are left out; "
+              "run 5.sentiment/sent_analysis.py --scope all first")
+    return n
+
+
+def apply_protest_filter(query: Dict[str, Any], col, threshold: Optional[float],
+                         sentiment_field: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Swap the stored-label condition in `query` (hf_reason / hf_label_name /
+    hf_label) for hf_confidence >= threshold. No-op when threshold is None.
+    If the query requires a sentiment field (or `sentiment_field` is given),
+    selected docs without it are counted and reported.
+    """
+    if threshold is None:
+        return query
+    ensure_confidence_index(col)
+    q = {k: v for k, v in query.items() if k not in ("hf_reason", "hf_label_name", "hf_label")}
+    q.update(threshold_match(threshold))
+    print(f"[what-if] PROTEST = hf_confidence >= {threshold:.3f} (stored labels ignored, except cascade cheap-stage docs)")
+    field = sentiment_field or next((k for k in q if _is_sentiment_key(k)), None)
+    if field is not None:
+        warn_missing_sentiment(q, col, field)
+    return q
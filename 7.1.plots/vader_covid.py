@@ -3,6 +3,8 @@ import pandas as pd
 from pymongo import MongoClient
 from pathlib import Path
 
+from protest_filter import apply_protest_filter, parse_threshold
+
 # ----------------------------
 # Config (edit these)
 # ----------------------------
@@ -37,6 +39,7 @@ def assign_period(d: pd.Timestamp) -> str:
         return "Post-COVID"
 
 def main():
+    threshold = parse_threshold()
     client = MongoClient(MONGO_URI)
     col = client[DB_NAME][COLLECTION_NAME]
 
@@ -56,6 +59,7 @@ def main():
         query["hf_reason"] = {"$regex": r"->\s*PROTEST\s*$"}
     else:
         query["hf_label_name"] = "PROTEST"
+    query = apply_protest_filter(query, col, threshold)
 
     projection = {
         "_id": 1,
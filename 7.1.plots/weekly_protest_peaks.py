@@ -12,6 +12,8 @@ from typing import Dict, Any, List
 import pandas as pd
 from pymongo import MongoClient
 
+from protest_filter import add_threshold_arg, apply_protest_filter
+
 
 # =========================================================
 # CONFIG 
@@ -68,6 +70,7 @@ def main() -> None:
                         help="Output CSV path for weekly counts by paper (default: 7.3outputsweekly_protest_counts_by_paper.csv).")
     parser.add_argument("--no-pivot", action="store_true",
                         help="If set, do not create the by-paper pivot CSV.")
+    add_threshold_arg(parser)
     args = parser.parse_args()
 
     if not MONGO_URI or "PASTE_YOUR_MONGO_URI_HERE" in MONGO_URI:
@@ -78,7 +81,7 @@ def main() -> None:
     client = MongoClient(MONGO_URI)
     col = client[args.db][args.collection]
 
-    query = build_query(args.label_source)
+    query = apply_protest_filter(build_query(args.label_source), col, args.threshold)
     df = fetch_docs(col, query)
 
     if df.empty: